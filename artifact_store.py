@@ -0,0 +1,144 @@
+"""Content-addressed, compressed storage for page artifacts (--output-store blobs).
+
+Instead of one loose file per page and format under output/html,
+output/text and output/screenshots, every artifact is stored once per
+distinct content in output/store/blobs/<2 hex>/<sha256>, zlib-compressed
+(".z") unless it is already compressed (PNG). An SQLite index maps
+(folder, URL key, kind) to its blob, so identical pages (error and 404
+templates, unchanged pairs) share one blob and long query strings never hit
+file name limits.
+
+Blobs are written by whoever produces the artifact, off the event loop (the
+post-processing workers, a thread for screenshots). Only the small index
+rows are written by the spider, batched into few commits like the crawl
+state.
+
+Reading: ArtifactStore.read() for one artifact, iter_pairs() for every
+reference/test pair of a kind, without walking directories.
+"""
+import hashlib
+import os
+import tempfile
+import time
+import zlib
+from urllib.parse import urlparse
+
+from sqlite_store import COMMIT_EVERY, BatchedCommits, connect
+
+STORE_DIR = os.path.join("output", "store")
+
+FOLDERS = ("reference", "test")
+
+COMPRESSION_LEVEL = 6
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS artifacts (
+    folder TEXT NOT NULL,
+    url_key TEXT NOT NULL,
+    kind TEXT NOT NULL,
+    url TEXT NOT NULL,
+    blob TEXT NOT NULL,
+    size INTEGER NOT NULL,
+    stored_size INTEGER NOT NULL,
+    updated_at REAL NOT NULL,
+    PRIMARY KEY (folder, url_key, kind)
+);
+"""
+
+
+def artifact_key(url):
+    """Path and query of url: the same for both halves of a pair, and never truncated or sanitized."""
+    parsed = urlparse(url)
+    return (parsed.path or "/") + ("?" + parsed.query if parsed.query else "")
+
+
+def blob_path(root, blob):
+    return os.path.join(root, "blobs", blob[:2], blob)
+
+
+def put_blob(root, data, compress=True):
+    """Store data unless a blob with the same content exists; returns its index entry."""
+    blob = hashlib.sha256(data).hexdigest() + (".z" if compress else "")
+    path = blob_path(root, blob)
+    if os.path.exists(path):
+        stored_size = os.path.getsize(path)
+    else:
+        stored = zlib.compress(data, COMPRESSION_LEVEL) if compress else data
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        # Written under a unique name and renamed, so concurrent writers of the same content never see half a blob.
+        descriptor, temporary = tempfile.mkstemp(suffix=".tmp", dir=os.path.dirname(path))
+        with os.fdopen(descriptor, "wb") as f:
+            f.write(stored)
+        os.replace(temporary, path)
+        stored_size = len(stored)
+    return {"blob": blob, "size": len(data), "stored_size": stored_size}
+
+
+def read_blob(root, blob):
+    with open(blob_path(root, blob), "rb") as f:
+        data = f.read()
+    return zlib.decompress(data) if blob.endswith(".z") else data
+
+
+class ArtifactStore(BatchedCommits):
+    """Index of the stored artifacts, and reads through it."""
+
+    def __init__(self, root=STORE_DIR, commit_every=COMMIT_EVERY):
+        self.root = root
+        os.makedirs(root, exist_ok=True)
+        super().__init__(connect(os.path.join(root, "index.sqlite")), commit_every)
+        self.connection.executescript(SCHEMA)
+        self.connection.commit()
+
+    def add(self, folder, url, kind, entry):
+        """Point (folder, url, kind) at the blob of a put_blob entry."""
+        self.connection.execute(
+            """
+            INSERT INTO artifacts (folder, url_key, kind, url, blob, size, stored_size, updated_at)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+            ON CONFLICT (folder, url_key, kind) DO UPDATE SET
+                url = excluded.url, blob = excluded.blob, size = excluded.size,
+                stored_size = excluded.stored_size, updated_at = excluded.updated_at
+            """,
+            (folder, artifact_key(url), kind, url, entry["blob"], entry["size"], entry["stored_size"], time.time()),
+        )
+        self._written()
+
+    def blobs(self, folder, url):
+        """{kind: blob} of every artifact stored for url in folder."""
+        rows = self.connection.execute(
+            "SELECT kind, blob FROM artifacts WHERE folder = ? AND url_key = ?", (folder, artifact_key(url))
+        )
+        return dict(rows.fetchall())
+
+    def read(self, folder, url, kind):
+        """Content of one artifact, or None if it was not stored."""
+        blob = self.blobs(folder, url).get(kind)
+        return read_blob(self.root, blob) if blob else None
+
+    def iter_pairs(self, kind):
+        """Yield (url_key, reference content, test content) for every pair that has both artifacts of kind."""
+        rows = self.connection.execute(
+            """
+            SELECT reference.url_key, reference.blob, test.blob
+            FROM artifacts AS reference
+            JOIN artifacts AS test ON test.url_key = reference.url_key AND test.kind = reference.kind
+            WHERE reference.folder = 'reference' AND test.folder = 'test' AND reference.kind = ?
+            ORDER BY reference.url_key
+            """,
+            (kind,),
+        )
+        for url_key, reference_blob, test_blob in rows.fetchall():
+            yield url_key, read_blob(self.root, reference_blob), read_blob(self.root, test_blob)
+
+    def summary(self):
+        """Artifact and distinct blob counts, with their raw and stored sizes."""
+        artifacts, size = self.connection.execute("SELECT COUNT(*), COALESCE(SUM(size), 0) FROM artifacts").fetchone()
+        blobs, stored_size = self.connection.execute(
+            "SELECT COUNT(*), COALESCE(SUM(stored_size), 0) FROM (SELECT DISTINCT blob, stored_size FROM artifacts)"
+        ).fetchone()
+        return {"artifacts": artifacts, "size": size, "blobs": blobs, "stored_size": stored_size}
+
+    def close(self):
+        self.commit()
+        self.connection.close()
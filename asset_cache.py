@@ -0,0 +1,229 @@
+"""Route-level cache for the scripts, styles, fonts and images pages share (--asset-cache).
+
+scrapy-playwright routes every request of a page through its own handler,
+and Playwright disables the browser's HTTP cache while a page has routes,
+so every page downloads the site's aggregated JS/CSS bundles again.
+CachingPlaywrightDownloadHandler puts AssetCache in front of that handler:
+cacheable subresources are fulfilled from a bounded in-memory LRU backed by
+a bounded on-disk LRU (output/asset_cache/<site>), and everything else
+(documents, XHR, requests the resource filter aborts) goes through
+unchanged.
+
+Entries are kept per site (browser context) and keyed by URL. They are
+fresh for their Cache-Control max-age (DEFAULT_TTL without one); no-cache
+entries, and private or must-revalidate ones without a max-age, are stale
+from the start. Stale entries with an ETag or Last-Modified are revalidated
+with a conditional request, others are fetched again. no-store responses,
+and responses that vary by request headers, are never cached; Vary:
+Accept-Encoding is fine, since bodies are stored decoded.
+"""
+import asyncio
+import hashlib
+import json
+import logging
+import os
+import re
+import threading
+import time
+from collections import OrderedDict
+
+from scrapy_playwright.handler import ScrapyPlaywrightDownloadHandler, _maybe_await
+
+logger = logging.getLogger(__name__)
+
+CACHE_DIR = os.path.join("output", "asset_cache")
+
+CACHED_RESOURCE_TYPES = {"script", "stylesheet", "font", "image"}
+
+# Seconds an entry without a Cache-Control max-age is served without revalidation.
+DEFAULT_TTL = 3600
+
+# Larger responses are not cached.
+MAX_ENTRY_BYTES = 10 * 1024 * 1024
+
+MEMORY_BYTES = 64 * 1024 * 1024
+DISK_BYTES = 512 * 1024 * 1024
+
+# The body Playwright hands over is already decoded, so these would be wrong for it.
+DROPPED_HEADERS = {"content-encoding", "content-length", "transfer-encoding"}
+
+MAX_AGE_RE = re.compile(r"max-age=(\d+)")
+
+
+class AssetCache:
+    """Two-level LRU of subresponses, one namespace per site."""
+
+    def __init__(self, cache_dir=CACHE_DIR, memory_bytes=MEMORY_BYTES, disk_bytes=DISK_BYTES, stats=None):
+        self.cache_dir = cache_dir
+        self.memory_bytes = memory_bytes
+        self.disk_bytes = disk_bytes
+        self.stats = stats
+        self.memory = OrderedDict()
+        self.memory_size = 0
+        # Entries on disk with their sizes, least recently used first.
+        self.disk = OrderedDict()
+        self.disk_size = 0
+        self._load_disk_index()
+
+    def _load_disk_index(self):
+        entries = []
+        for root, _, files in os.walk(self.cache_dir):
+            for name in files:
+                path = os.path.join(root, name)
+                entries.append((os.path.getmtime(path), path, os.path.getsize(path)))
+        for _, path, size in sorted(entries):
+            self.disk[path] = size
+            self.disk_size += size
+
+    def entry_path(self, site, url):
+        return os.path.join(self.cache_dir, site, hashlib.sha256(url.encode("utf-8")).hexdigest())
+
+    async def handle(self, site, route, request):
+        """Answer a subresource request from the cache, refreshing the entry when needed."""
+        path = self.entry_path(site, request.url)
+        entry = self.memory.get(path)
+        if entry is not None:
+            self.memory.move_to_end(path)
+        elif path in self.disk:
+            entry = await asyncio.get_running_loop().run_in_executor(None, read_entry, path)
+            if entry is not None:
+                self.disk.move_to_end(path)
+                self._remember(path, entry)
+
+        if entry is not None and time.time() < entry["expires"]:
+            self._count("hit")
+            await route.fulfill(status=entry["status"], headers=entry["headers"], body=entry["body"])
+            return
+
+        headers = None
+        if entry is not None and (entry.get("etag") or entry.get("last_modified")):
+            headers = {**request.headers}
+            if entry.get("etag"):
+                headers["if-none-match"] = entry["etag"]
+            if entry.get("last_modified"):
+                headers["if-modified-since"] = entry["last_modified"]
+        try:
+            response = await route.fetch(headers=headers)
+        except Exception as e:
+            # Let the browser make (and fail) the request itself.
+            logger.debug(f"Asset cache fetch failed for {request.url}: {e}")
+            await route.continue_()
+            return
+        if response.status == 304 and entry is not None:
+            self._count("revalidated")
+            entry["expires"] = time.time() + max_age(response.headers, entry["max_age"])
+            await self._store(path, entry)
+            await route.fulfill(status=entry["status"], headers=entry["headers"], body=entry["body"])
+            return
+
+        self._count("miss")
+        body = await response.body()
+        await route.fulfill(response=response, body=body)
+        if response.status != 200 or len(body) > MAX_ENTRY_BYTES or not cacheable(response.headers):
+            return
+        ttl = max_age(response.headers, DEFAULT_TTL)
+        if not ttl and not (response.headers.get("etag") or response.headers.get("last-modified")):
+            return
+        await self._store(path, {
+            "status": response.status,
+            "headers": {name: value for name, value in response.headers.items() if name not in DROPPED_HEADERS},
+            "etag": response.headers.get("etag"),
+            "last_modified": response.headers.get("last-modified"),
+            "max_age": ttl,
+            "expires": time.time() + ttl,
+            "body": body,
+        })
+
+    async def _store(self, path, entry):
+        self._remember(path, entry)
+        size = await asyncio.get_running_loop().run_in_executor(None, write_entry, path, entry)
+        self.disk_size += size - self.disk.pop(path, 0)
+        self.disk[path] = size
+        while self.disk_size > self.disk_bytes and self.disk:
+            evicted, evicted_size = self.disk.popitem(last=False)
+            self.disk_size -= evicted_size
+            try:
+                os.remove(evicted)
+            except OSError:
+                pass
+
+    def _remember(self, path, entry):
+        previous = self.memory.pop(path, None)
+        if previous is not None:
+            self.memory_size -= len(previous["body"])
+        self.memory[path] = entry
+        self.memory_size += len(entry["body"])
+        while self.memory_size > self.memory_bytes and self.memory:
+            _, evicted = self.memory.popitem(last=False)
+            self.memory_size -= len(evicted["body"])
+
+    def _count(self, outcome):
+        if self.stats is not None:
+            self.stats.inc_value(f"asset_cache/{outcome}")
+
+
+def max_age(headers, default):
+    """Seconds a response is served without revalidation; 0 when it has to be revalidated every time."""
+    cache_control = headers.get("cache-control", "").lower()
+    if "no-cache" in cache_control:
+        return 0
+    match = MAX_AGE_RE.search(cache_control)
+    if match:
+        return int(match.group(1))
+    if "private" in cache_control or "must-revalidate" in cache_control:
+        return 0
+    return default
+
+
+def cacheable(headers):
+    """False for no-store responses and responses that vary by request headers other than Accept-Encoding."""
+    if "no-store" in headers.get("cache-control", "").lower():
+        return False
+    vary = {name.strip().lower() for name in headers.get("vary", "").split(",") if name.strip()}
+    return vary <= {"accept-encoding"}
+
+
+def read_entry(path):
+    """An entry written by write_entry: a JSON header line, then the body."""
+    try:
+        with open(path, "rb") as f:
+            header = json.loads(f.readline())
+            header["body"] = f.read()
+        return header
+    except (OSError, ValueError) as e:
+        logger.debug(f"Unreadable asset cache entry {path}: {e}")
+        return None
+
+
+def write_entry(path, entry):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    header = json.dumps({key: value for key, value in entry.items() if key != "body"}).encode("utf-8")
+    temporary = f"{path}.{threading.get_ident()}.tmp"
+    with open(temporary, "wb") as f:
+        f.write(header + b"\n")
+        f.write(entry["body"])
+    os.replace(temporary, path)
+    return len(header) + 1 + len(entry["body"])
+
+
+class CachingPlaywrightDownloadHandler(ScrapyPlaywrightDownloadHandler):
+    """scrapy-playwright's handler with the spider's AssetCache in front of its request routing."""
+
+    def _make_request_handler(self, *args, **kwargs):
+        request_handler = super()._make_request_handler(*args, **kwargs)
+        cache = getattr(kwargs["spider"], "asset_cache", None)
+        if cache is None:
+            return request_handler
+        context_name = kwargs["context_name"]
+
+        async def cached_request_handler(route, playwright_request):
+            if playwright_request.method != "GET" or playwright_request.resource_type not in CACHED_RESOURCE_TYPES:
+                await request_handler(route, playwright_request)
+            elif self.abort_request and await _maybe_await(self.abort_request(playwright_request)):
+                # Aborted here, as request_handler would, without asking the predicate twice.
+                await route.abort()
+                self.stats.inc_value("playwright/request_count/aborted")
+            else:
+                await cache.handle(context_name, route, playwright_request)
+
+        return cached_request_handler
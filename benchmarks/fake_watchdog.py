@@ -0,0 +1,44 @@
+"""Stand-in for WatchdogClient that answers from memory after a simulated query time.
+
+It keeps the real client's interface (start, close, errors_for) and thread
+pool, so lookups cost the crawler what a database round trip would, without
+a MySQL server. Every ERROR_EVERY-th path has a PHP notice logged for it.
+"""
+import asyncio
+import time
+import zlib
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urlparse
+
+from watchdog_logs import join_logs
+
+# Simulated time (ms) of one watchdog query; set by the benchmark before the crawl.
+QUERY_MS = 5
+
+ERROR_EVERY = 7
+
+
+class FakeWatchdogClient:
+    def __init__(self, db_config, mode="per-page", pool_size=4):
+        self.mode = mode
+        self.executor = ThreadPoolExecutor(max_workers=pool_size, thread_name_prefix="watchdog")
+
+    def start(self):
+        pass
+
+    def close(self):
+        self.executor.shutdown(wait=False, cancel_futures=True)
+
+    async def errors_for(self, url):
+        path = urlparse(url).path or "/"
+        loop = asyncio.get_running_loop()
+        return join_logs(await loop.run_in_executor(self.executor, self._query, path))
+
+    def _query(self, path):
+        time.sleep(QUERY_MS / 1000)
+        if zlib.crc32(path.encode("utf-8")) % ERROR_EVERY:
+            return []
+        return [{
+            "timestamp": int(time.time()), "type": "php", "severity": 3, "variables": None,
+            "message": f"Notice: Undefined index: field_image in template_preprocess_node() for {path}",
+        }]
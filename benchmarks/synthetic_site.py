@@ -0,0 +1,146 @@
+"""A generated Drupal-like site served from memory, for offline crawl benchmarks.
+
+Pages live at /node/<n> (/fr/node/<n> for the translated share) and form
+a tree: the front page links to the first level, every page to its
+children and back to a few menu pages, so the crawler also deduplicates.
+A share of the pages renders its content client-side into <div id="app">
+(the --fetch hybrid case), and every page references a stylesheet and an
+image, which the browser only loads with screenshots on.
+
+    site = SyntheticSite(pages=200, depth=3)
+    server, base_url = serve(site, "localhost")
+"""
+import json
+import random
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# A 1x1 transparent PNG.
+PIXEL_PNG = bytes.fromhex(
+    "89504e470d0a1a0a0000000d4948445200000001000000010806000000"
+    "1f15c4890000000d49444154789c6360000002000001e221bc330000000049454e44ae426082"
+)
+
+STYLESHEET = b"body { font-family: sans-serif; max-width: 60em; margin: auto; } .hero { width: 100%; height: 200px; }"
+
+# Pages linked from every page, like a main menu.
+MENU_SIZE = 5
+
+WORDS = ("drupal", "node", "content", "field", "view", "block", "region", "theme", "module", "entity",
+         "revision", "taxonomy", "menu", "cache", "render", "page", "article", "media", "user", "site")
+
+APP_SCRIPT = """
+<script>
+document.addEventListener('DOMContentLoaded', () => {
+  const app = document.getElementById('app');
+  const data = JSON.parse(document.getElementById('page-data').textContent);
+  const article = document.createElement('article');
+  article.innerHTML = data.body;
+  app.appendChild(article);
+});
+</script>
+"""
+
+
+class SyntheticSite:
+    """Deterministic page set: same arguments and seed, same pages."""
+
+    def __init__(self, pages=200, depth=3, weight_kb=30, js_share=0.2, lang_share=0.1, seed=1):
+        self.depth = depth
+        rng = random.Random(seed)
+        # Smallest branching factor whose tree of the given depth holds every page.
+        self.branching = 1
+        while sum(self.branching ** level for level in range(1, depth + 1)) < pages - 1:
+            self.branching += 1
+        self.paths = ["/"] + [
+            f"/fr/node/{n}" if rng.random() < lang_share else f"/node/{n}" for n in range(1, pages)
+        ]
+        self.index = {path: index for index, path in enumerate(self.paths)}
+        self.client_rendered = {path for path in self.paths[1:] if rng.random() < js_share}
+        self.bodies = {path: self.text(rng, weight_kb * 1024) for path in self.paths}
+        self.sitemap = self.render_sitemap()
+
+    @staticmethod
+    def text(rng, size):
+        paragraphs, length = [], 0
+        while length < size:
+            paragraph = " ".join(rng.choice(WORDS) for _ in range(80))
+            paragraphs.append(f"<p>{paragraph}</p>")
+            length += len(paragraph) + 7
+        return "\n".join(paragraphs)
+
+    def children(self, index):
+        first = index * self.branching + 1
+        return [self.paths[i] for i in range(first, min(first + self.branching, len(self.paths)))]
+
+    def page(self, path):
+        """HTML of the page at path, or None."""
+        index = self.index.get(path)
+        if index is None:
+            return None
+        lang = "fr" if path.startswith("/fr/") else "en"
+        links = "".join(f'<li><a href="{link}">{link}</a></li>' for link in self.paths[1:MENU_SIZE + 1] + self.children(index))
+        body = self.bodies[path]
+        if path in self.client_rendered:
+            # The body is only in a JSON blob; the visible content is rendered by the script.
+            content = ('<div id="app"></div><script type="application/json" id="page-data">'
+                       + json_string({"body": body}) + "</script>" + APP_SCRIPT)
+        else:
+            content = f"<article>{body}</article>"
+        return (
+            f'<!DOCTYPE html><html lang="{lang}"><head><meta charset="utf-8"><title>Node {index}</title>'
+            f'<link rel="stylesheet" href="/sites/default/files/css/site.css"></head>'
+            f'<body><header><nav><ul>{links}</ul></nav></header>'
+            f'<img class="hero" src="/sites/default/files/hero-{index % 10}.png" alt="">'
+            f"<main>{content}</main><footer>Powered by Drupal</footer></body></html>"
+        ).encode("utf-8")
+
+    def render_sitemap(self):
+        urls = "".join(f"<url><loc>{path}</loc></url>" for path in self.paths)
+        return f'<?xml version="1.0" encoding="UTF-8"?><urlset xmlns="http://www.sitemaps.org/schemas/sitemap/0.9">{urls}</urlset>'
+
+
+def json_string(value):
+    # </script> inside the blob would end the script element early.
+    return json.dumps(value).replace("</", "<\\/")
+
+
+def serve(site, host, port=0, latency_ms=0):
+    """Serve site on a background thread; returns (server, base URL). Stop it with server.shutdown()."""
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            if latency_ms:
+                time.sleep(latency_ms / 1000)
+            path = self.path.split("?")[0]
+            if path.startswith("/sites/default/files/"):
+                if path.endswith(".css"):
+                    self.respond(200, "text/css", STYLESHEET)
+                else:
+                    self.respond(200, "image/png", PIXEL_PNG)
+            elif path == "/sitemap.xml":
+                # Sitemap locations are absolute URLs.
+                self.respond(200, "application/xml", site.sitemap.replace("<loc>/", f"<loc>{base_url}").encode())
+            else:
+                html = site.page(path)
+                if html is None:
+                    self.respond(404, "text/html", b"<html><body>Page not found</body></html>")
+                else:
+                    self.respond(200, "text/html; charset=utf-8", html)
+
+        def respond(self, status, content_type, body):
+            self.send_response(status)
+            self.send_header("Content-Type", content_type)
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, format, *args):
+            pass
+
+    server = ThreadingHTTPServer((host, port), Handler)
+    server.daemon_threads = True
+    base_url = f"http://{host}:{server.server_address[1]}/"
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, base_url
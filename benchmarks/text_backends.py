@@ -0,0 +1,86 @@
+"""Compare the native and pandoc Markdown backends on saved output/html files.
+
+Reports throughput for each backend and how closely the native output
+matches pandoc's (line-based similarity ratio, 1.0 means identical).
+
+    python benchmarks/text_backends.py --corpus output/html --limit 500
+"""
+import argparse
+import difflib
+import os
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from bs4 import BeautifulSoup  # noqa: E402
+
+from text_extraction import clean_soup, pandoc_to_markdown, soup_to_markdown  # noqa: E402
+
+
+def iter_corpus(corpus, limit):
+    count = 0
+    for root, _, files in os.walk(corpus):
+        for name in sorted(files):
+            if not name.endswith(".html"):
+                continue
+            yield os.path.join(root, name)
+            count += 1
+            if limit and count >= limit:
+                return
+
+
+def similarity(expected, actual):
+    return difflib.SequenceMatcher(None, expected.splitlines(), actual.splitlines(), autojunk=False).ratio()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Fidelity and throughput of the native Markdown backend vs pandoc.")
+    parser.add_argument("--corpus", default=os.path.join("output", "html"), help="Directory of saved HTML files.")
+    parser.add_argument("--limit", type=int, default=0, help="Only convert the first N files (0 = all).")
+    parser.add_argument("--worst", type=int, default=5, help="Show the N least similar pages.")
+    args = parser.parse_args()
+
+    timings = {"native": 0.0, "pandoc": 0.0}
+    ratios = []
+    pages = 0
+    for path in iter_corpus(args.corpus, args.limit):
+        with open(path, "rb") as f:
+            html = f.read().decode("utf-8", errors="replace")
+        cleaned = clean_soup(BeautifulSoup(html, "html.parser"))
+
+        started = time.perf_counter()
+        native = soup_to_markdown(cleaned)
+        timings["native"] += time.perf_counter() - started
+
+        started = time.perf_counter()
+        try:
+            pandoc = pandoc_to_markdown(str(cleaned))
+        except Exception as e:
+            print(f"pandoc failed for {path}: {e}", file=sys.stderr)
+            continue
+        timings["pandoc"] += time.perf_counter() - started
+
+        ratios.append((similarity(pandoc, native), path))
+        pages += 1
+
+    if not pages:
+        print(f"No HTML files converted from {args.corpus}")
+        return 1
+
+    print(f"Pages: {pages}")
+    for backend, seconds in timings.items():
+        print(f"{backend:>7}: {seconds:8.2f}s total, {pages / seconds if seconds else float('inf'):8.1f} pages/s")
+    if timings["native"]:
+        print(f"Speedup: {timings['pandoc'] / timings['native']:.1f}x")
+    values = [ratio for ratio, _ in ratios]
+    print(f"Similarity to pandoc: mean {statistics.mean(values):.3f}, median {statistics.median(values):.3f}, "
+          f"min {min(values):.3f}")
+    for ratio, path in sorted(ratios)[:args.worst]:
+        print(f"  {ratio:.3f}  {path}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,165 @@
+"""Long-lived browser contexts per site and a pool of reusable pages.
+
+Each site (reference/test) gets one named scrapy-playwright context, created
+at engine start through PLAYWRIGHT_CONTEXTS with the site's HTTP credentials.
+The init script is installed on the context once instead of per page, and
+resource blocking goes through PLAYWRIGHT_ABORT_REQUEST, which
+scrapy-playwright checks inside its own route handler for every page.
+
+Pages are not closed after parsing: they are parked in a bounded pool per
+context and handed to the next request for that context by
+PagePoolMiddleware, so most requests skip page creation entirely. Every
+page streams its console output into console_capture (console_errors.py),
+which starts afresh for each request, and keeps the response of the
+document it last navigated to, whose body is the HTML as served.
+"""
+import logging
+import os
+from collections import deque
+
+from console_errors import MAX_MESSAGES, ConsoleCapture
+
+logger = logging.getLogger(__name__)
+
+INIT_SCRIPT_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "custom_script.js")
+
+PHASE_CONTEXTS = {1: "reference", 2: "test"}
+
+ALLOWED_RESOURCE_TYPES = {"document", "script"}
+
+# Never visible in a screenshot.
+SCREENSHOT_BLOCKED_TYPES = {"media", "websocket", "eventsource", "manifest", "texttrack", "ping"}
+
+
+def should_abort_request(request):
+    """PLAYWRIGHT_ABORT_REQUEST predicate: only documents and scripts are loaded."""
+    return request.resource_type not in ALLOWED_RESOURCE_TYPES
+
+
+def should_abort_screenshot_request(request):
+    """PLAYWRIGHT_ABORT_REQUEST predicate with screenshots: everything that can show on the page is loaded."""
+    return request.resource_type in SCREENSHOT_BLOCKED_TYPES
+
+
+class BrowserContexts:
+    """Named context settings per site and the pool of idle pages for each."""
+
+    def __init__(self, auth_by_phase, pool_size=4, viewport=None, console_buffer=MAX_MESSAGES):
+        """auth_by_phase maps each crawled phase to its HTTP credentials (or None)."""
+        self.context_kwargs = {}
+        for phase, auth in auth_by_phase.items():
+            self.context_kwargs[PHASE_CONTEXTS[phase]] = {"http_credentials": auth} if auth else {}
+            if viewport:
+                self.context_kwargs[PHASE_CONTEXTS[phase]]["viewport"] = viewport
+        self.pool_size = pool_size
+        self.idle_pages = {name: deque() for name in self.context_kwargs}
+        self.prepared_contexts = {}
+        self.console_capture = ConsoleCapture(console_buffer)
+        # The last document response of each page.
+        self.documents = {}
+
+    def context_name(self, phase):
+        return PHASE_CONTEXTS[phase]
+
+    def playwright_settings(self, block_resources, concurrency):
+        """Settings that pre-create the contexts and size their page limits to leave room for the pool."""
+        settings = {
+            "PLAYWRIGHT_CONTEXTS": self.context_kwargs,
+            "PLAYWRIGHT_MAX_PAGES_PER_CONTEXT": concurrency + self.pool_size,
+        }
+        settings["PLAYWRIGHT_ABORT_REQUEST"] = should_abort_request if block_resources else should_abort_screenshot_request
+        return settings
+
+    async def init_page(self, page, request):
+        """playwright_page_init_callback: capture the console and documents of every new page and prepare its context."""
+        self.console_capture.attach(page)
+        self.track_documents(page)
+        await self.prepare(page, request.meta["playwright_context"])
+
+    def track_documents(self, page):
+        """Keep the response of the document each navigation of the page loads (the last redirect's target)."""
+        def on_response(response):
+            if response.request.is_navigation_request() and response.frame == page.main_frame:
+                self.documents[page] = response
+
+        page.on("response", on_response)
+        page.on("close", lambda _: self.documents.pop(page, None))
+
+    async def document_body(self, page):
+        """The HTML the page's last navigation received, before any script ran, or None."""
+        response = self.documents.get(page)
+        if response is None:
+            return None
+        try:
+            return await response.body()
+        except Exception as e:
+            logger.debug(f"Document body of {response.url} is not available: {e}")
+            return None
+
+    async def prepare(self, page, context_name):
+        """Install the init script on the page's context, once per context."""
+        context = page.context
+        if self.prepared_contexts.get(context_name) is context:
+            return
+        await context.add_init_script(path=INIT_SCRIPT_PATH)
+        self.prepared_contexts[context_name] = context
+
+    def open_pages(self):
+        """Pages open in the site contexts, in use or idle in the pool."""
+        return sum(len(context.pages) for context in self.prepared_contexts.values())
+
+    async def recycle(self):
+        """Close the idle pages and the contexts; scrapy-playwright opens new contexts for the next requests."""
+        for pages in self.idle_pages.values():
+            while pages:
+                page = pages.pop()
+                if not page.is_closed():
+                    await page.close()
+        contexts = list(self.prepared_contexts.values())
+        self.prepared_contexts.clear()
+        for context in contexts:
+            await context.close()
+
+    def acquire(self, context_name):
+        """Return an idle page for the context, or None to let scrapy-playwright open one."""
+        pages = self.idle_pages[context_name]
+        while pages:
+            page = pages.pop()
+            if not page.is_closed():
+                self.console_capture.reset(page)
+                self.documents.pop(page, None)
+                return page
+        return None
+
+    async def release(self, page, context_name):
+        """Park a page for reuse, or close it when the pool is full."""
+        if page.is_closed():
+            return
+        pages = self.idle_pages[context_name]
+        if len(pages) >= self.pool_size or self.prepared_contexts.get(context_name) is not page.context:
+            await page.close()
+            return
+        try:
+            # Unload the document so its timers and requests stop while the page is idle.
+            await page.goto("about:blank")
+        except Exception as e:
+            logger.debug(f"Closing page that failed to reset: {e}")
+            await page.close()
+            return
+        pages.append(page)
+
+
+class PagePoolMiddleware:
+    """Downloader middleware that gives browser requests a pooled page of their context."""
+
+    def process_request(self, request, spider):
+        contexts = getattr(spider, "browser_contexts", None)
+        if not contexts or not request.meta.get("playwright") or request.meta.get("playwright_page"):
+            return None
+        context_name = request.meta.get("playwright_context")
+        if context_name in contexts.idle_pages:
+            page = contexts.acquire(context_name)
+            if page is not None:
+                request.meta["playwright_page"] = page
+                spider.crawler.stats.inc_value("page_pool/reused")
+        return None
@@ -0,0 +1,177 @@
+"""Per-site download concurrency adjusted from measured page loads.
+
+Reference and test requests go through their own downloader slot (named
+after the browser context). Every rendered page reports its TTFB and load
+event time, every failed request an error. Once a site has a full window
+of samples since its last change, the controller decides:
+
+* decrease (multiplicatively) when the error rate is over the budget, the
+  75th percentile load event is over the target, or the median TTFB has
+  grown well past the site's best median seen so far (the server is
+  queueing requests);
+* increase by one when none of that holds and latency has headroom
+  ("at_maximum" when it is already at the maximum);
+* otherwise keep the current concurrency ("hold").
+
+Every decision, changed or not, is written to output/concurrency.csv.
+"""
+import csv
+import datetime
+import logging
+import os
+import statistics
+from collections import deque
+
+logger = logging.getLogger(__name__)
+
+DECISION_LOG_PATH = os.path.join("output", "concurrency.csv")
+
+DECISION_LOG_HEADER = [
+    "timestamp", "site", "old_concurrency", "new_concurrency", "reason",
+    "ttfb_median (ms)", "ttfb_baseline (ms)", "load_event_p75 (ms)", "error_rate", "samples",
+]
+
+# Samples collected at the current concurrency before deciding again.
+WINDOW = 20
+
+# Median TTFB above baseline * TTFB_TOLERANCE counts as server-side queueing,
+# unless the difference is below TTFB_SLACK_MS (jitter on fast responses).
+TTFB_TOLERANCE = 2.0
+TTFB_SLACK_MS = 100
+
+# Multiplicative decrease factor, and the share of the load target below which concurrency may grow.
+DECREASE = 0.75
+HEADROOM = 0.8
+
+
+def percentile(values, fraction):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))]
+
+
+class SiteConcurrency:
+    """Samples and current concurrency for one site."""
+
+    def __init__(self, name, start, minimum, maximum):
+        self.name = name
+        self.concurrency = max(minimum, min(maximum, start))
+        self.minimum = minimum
+        self.maximum = maximum
+        self.samples = deque(maxlen=WINDOW)
+        self.ttfb_baseline = None
+
+    def summary(self):
+        ttfbs = [ttfb for ttfb, _, _ in self.samples if ttfb is not None]
+        loads = [load for _, load, _ in self.samples if load is not None]
+        return {
+            "ttfb_median": statistics.median(ttfbs) if ttfbs else None,
+            "load_p75": percentile(loads, 0.75) if loads else None,
+            "error_rate": sum(1 for _, _, error in self.samples if error) / len(self.samples),
+        }
+
+    def decide(self, target_load_ms, error_budget):
+        """Return (new concurrency, reason, summary) for a full window, else None."""
+        if len(self.samples) < WINDOW:
+            return None
+        summary = self.summary()
+        ttfb, load = summary["ttfb_median"], summary["load_p75"]
+        if ttfb is not None and (self.ttfb_baseline is None or ttfb < self.ttfb_baseline):
+            self.ttfb_baseline = ttfb
+
+        if summary["error_rate"] > error_budget:
+            reason = "errors"
+        elif target_load_ms and load is not None and load > target_load_ms:
+            reason = "load_event"
+        elif ttfb is not None and ttfb > self.ttfb_baseline * TTFB_TOLERANCE and ttfb - self.ttfb_baseline > TTFB_SLACK_MS:
+            reason = "ttfb"
+        else:
+            reason = None
+
+        if reason:
+            new = max(self.minimum, min(self.concurrency - 1, int(self.concurrency * DECREASE)))
+        elif not target_load_ms or load is None or load < target_load_ms * HEADROOM:
+            new = min(self.maximum, self.concurrency + 1)
+            reason = "headroom" if new > self.concurrency else "at_maximum"
+        else:
+            reason, new = "hold", self.concurrency
+        # Measurements taken at the old concurrency say nothing about the new one.
+        self.samples.clear()
+        return new, reason, summary
+
+
+class ConcurrencyController:
+    """Sets the downloader slot concurrency of each site from its page load samples."""
+
+    def __init__(self, sites, start, minimum=1, maximum=16, target_load_ms=0, error_budget=0.05, adaptive=True):
+        self.sites = {name: SiteConcurrency(name, start, minimum, maximum) for name in sites}
+        self.target_load_ms = target_load_ms
+        self.error_budget = error_budget
+        self.adaptive = adaptive
+        self.downloader = None
+        self.stats = None
+        self.log_handle = None
+        self.log_writer = None
+
+    @property
+    def total_concurrency(self):
+        """Upper bound for CONCURRENT_REQUESTS: every site at its maximum."""
+        return sum(site.maximum if self.adaptive else site.concurrency for site in self.sites.values())
+
+    def open(self, downloader, stats, append=False):
+        self.downloader = downloader
+        self.stats = stats
+        if not self.adaptive:
+            return
+        append = append and os.path.exists(DECISION_LOG_PATH) and os.path.getsize(DECISION_LOG_PATH) > 0
+        self.log_handle = open(DECISION_LOG_PATH, "a" if append else "w", newline="", encoding="utf-8")
+        self.log_writer = csv.writer(self.log_handle)
+        if not append:
+            self.log_writer.writerow(DECISION_LOG_HEADER)
+
+    def close(self):
+        if self.log_handle:
+            self.log_handle.close()
+
+    def record(self, name, ttfb=None, load_event=None, error=False):
+        """Add one page load (timings in ms, None when unknown) or one failed request for a site."""
+        site = self.sites.get(name)
+        if site is None:
+            return
+        self.apply(site)
+        if not self.adaptive:
+            return
+        site.samples.append((positive(ttfb), positive(load_event), error))
+        decision = site.decide(self.target_load_ms, self.error_budget)
+        if decision is None:
+            return
+        new, reason, summary = decision
+        self.log_writer.writerow([
+            datetime.datetime.now().isoformat(), name, site.concurrency, new, reason,
+            summary["ttfb_median"], site.ttfb_baseline, summary["load_p75"],
+            round(summary["error_rate"], 3), WINDOW,
+        ])
+        self.log_handle.flush()
+        if new != site.concurrency:
+            logger.info(f"Concurrency for {name}: {site.concurrency} -> {new} ({reason})")
+            site.concurrency = new
+            self.apply(site)
+
+    def slot_settings(self):
+        """DOWNLOAD_SLOTS entries with each site's starting concurrency."""
+        return {name: {"concurrency": site.concurrency} for name, site in self.sites.items()}
+
+    def apply(self, site):
+        """Push the site's concurrency to its downloader slot, and to the settings of a slot recreated after idling."""
+        if self.downloader is None:
+            return
+        self.downloader.per_slot_settings.setdefault(site.name, {})["concurrency"] = site.concurrency
+        slot = self.downloader.slots.get(site.name)
+        if slot is not None:
+            slot.concurrency = site.concurrency
+        if self.stats is not None:
+            self.stats.set_value(f"concurrency/{site.name}", site.concurrency)
+
+
+def positive(value):
+    """Timings of 0 or less mean the event had not happened when measured."""
+    return value if value is not None and value > 0 else None
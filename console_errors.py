@@ -0,0 +1,234 @@
+"""Browser console output streamed per page, and a crawl-wide index of console errors.
+
+ConsoleCapture listens to the console and pageerror events of every browser
+page as they happen. Per request it keeps the latest messages in a ring
+buffer (--console-buffer), counts every message by type, and fingerprints
+errors and warnings: the text with origins, ids, numbers, query strings and
+hashed script and style names (Drupal's js_<hash>.js aggregates) normalized,
+so the same error on the reference and the test site, or on a thousand node
+pages, has one fingerprint.
+
+ErrorIndex aggregates the fingerprints of every page: occurrences, affected
+pages and a few example paths per site. write_error_index merges the index
+of every process into output/console/index.json and index.md, listing each
+unique error with the reference and test pages it affects, errors only seen
+on the test site first.
+"""
+import glob
+import hashlib
+import json
+import os
+import re
+from collections import Counter, deque
+
+from postprocess import OUTPUT_DIR
+
+CONSOLE_DIR = os.path.join(OUTPUT_DIR, "console")
+
+# Messages kept per page (the latest ones).
+MAX_MESSAGES = 50
+
+# Longer message texts are cut.
+MAX_TEXT = 1000
+
+# Types that are fingerprinted and indexed; "pageerror" is an uncaught exception.
+INDEXED_TYPES = ("pageerror", "error", "warning")
+
+# Distinct fingerprints counted per page, and example paths kept per fingerprint and site.
+MAX_PAGE_FINGERPRINTS = 100
+MAX_EXAMPLES = 10
+
+# Pages between writes of a process's index.
+WRITE_EVERY = 500
+
+SITES = ("reference", "test")
+
+ORIGIN_RE = re.compile(r"\b[a-z][a-z0-9+.-]*://[^/\s'\"]+", re.IGNORECASE)
+# Query strings of URLs and paths, up to a stack frame's :line:column.
+QUERY_RE = re.compile(r"(/[^\s'\"()?]*)\?[^\s'\"():]+")
+# Script and style names: Drupal aggregates (js_<base64>.js), and long name segments with digits (bundle hashes).
+AGGREGATE_RE = re.compile(r"\b(js|css)_[\w-]{16,}(?=\.(?:js|css)\b)")
+HASHED_SEGMENT_RE = re.compile(r"(?<![\w-])(?=[\w-]*\d)[\w-]{16,}(?=(?:\.[\w-]+)*\.(?:m?js|css)\b)")
+ID_RE = re.compile(r"\b(?=[0-9a-f-]*\d)[0-9a-f][0-9a-f-]{7,}\b", re.IGNORECASE)
+NUMBER_RE = re.compile(r"\d+")
+SPACE_RE = re.compile(r"\s+")
+
+
+def normalize(text):
+    """Message text without what differs between sites and pages: origins, asset hashes, queries, ids, numbers."""
+    text = ORIGIN_RE.sub("<origin>", text)
+    text = QUERY_RE.sub(r"\1", text)
+    text = AGGREGATE_RE.sub(r"\1_<hash>", text)
+    text = HASHED_SEGMENT_RE.sub("<hash>", text)
+    text = ID_RE.sub("<id>", text)
+    text = NUMBER_RE.sub("N", text)
+    return SPACE_RE.sub(" ", text).strip()[:MAX_TEXT]
+
+
+def fingerprint(kind, text, source=None):
+    return hashlib.sha1(f"{kind}\n{normalize(text)}\n{normalize(source or '')}".encode("utf-8")).hexdigest()[:12]
+
+
+def error_text(error):
+    """Text of a pageerror: name, message and the top stack frame."""
+    frames = [line.strip() for line in (error.stack or "").splitlines() if line.strip().startswith("at ")]
+    text = f"{error.name}: {error.message}" if error.name else error.message
+    return f"{text} {frames[0]}" if frames else text
+
+
+class PageConsole:
+    """Console output of the current request of one page."""
+
+    def __init__(self, max_messages):
+        self.messages = deque(maxlen=max_messages)
+        self.counts = Counter()
+        # fingerprint -> [type, text, source, occurrences]
+        self.errors = {}
+
+    def add(self, kind, text, source=None):
+        text = text[:MAX_TEXT]
+        self.messages.append({"type": kind, "text": text})
+        self.counts[kind] += 1
+        if kind not in INDEXED_TYPES:
+            return
+        key = fingerprint(kind, text, source)
+        if key in self.errors:
+            self.errors[key][3] += 1
+        elif len(self.errors) < MAX_PAGE_FINGERPRINTS:
+            self.errors[key] = [kind, text, source, 1]
+
+
+class ConsoleCapture:
+    """Console and pageerror listeners for every browser page, with one PageConsole each."""
+
+    def __init__(self, max_messages=MAX_MESSAGES):
+        self.max_messages = max_messages
+        self.pages = {}
+
+    def attach(self, page):
+        console = self.pages[page] = PageConsole(self.max_messages)
+        page.on("console", lambda message: self.pages.get(page, console).add(
+            message.type, message.text, message.location.get("url")))
+        page.on("pageerror", lambda error: self.pages.get(page, console).add("pageerror", error_text(error)))
+        page.on("close", lambda _: self.pages.pop(page, None))
+
+    def reset(self, page):
+        """Start a new request on a (pooled) page."""
+        if page in self.pages:
+            self.pages[page] = PageConsole(self.max_messages)
+
+    def take(self, page):
+        """The page's PageConsole since the last reset; the page starts a new one."""
+        console = self.pages.get(page)
+        if console is None:
+            return PageConsole(0)
+        self.pages[page] = PageConsole(self.max_messages)
+        return console
+
+
+class ErrorIndex:
+    """Fingerprinted errors of the pages handled by this process, written to its own file."""
+
+    def __init__(self, console_dir=CONSOLE_DIR, append=False, suffix=""):
+        os.makedirs(console_dir, exist_ok=True)
+        if not append:
+            for path in glob.glob(os.path.join(console_dir, "errors*.json")):
+                os.remove(path)
+        self.path = os.path.join(console_dir, f"errors{suffix}.json")
+        self.entries = read_index(self.path) if append and os.path.exists(self.path) else {}
+        self.pages_since_write = 0
+
+    def add(self, site, path, console):
+        """Index the errors of one page (a PageConsole) of site."""
+        for key, (kind, text, source, occurrences) in console.errors.items():
+            entry = self.entries.setdefault(key, new_entry(kind, text, source))
+            counts = entry[site]
+            counts["pages"] += 1
+            counts["occurrences"] += occurrences
+            if len(counts["examples"]) < MAX_EXAMPLES and path not in counts["examples"]:
+                counts["examples"].append(path)
+        self.pages_since_write += 1
+        if self.pages_since_write >= WRITE_EVERY:
+            self.write()
+
+    def write(self):
+        temporary = f"{self.path}.tmp"
+        with open(temporary, "w", encoding="utf-8") as f:
+            json.dump(self.entries, f)
+        os.replace(temporary, self.path)
+        self.pages_since_write = 0
+
+    def close(self):
+        self.write()
+
+
+def new_entry(kind, text, source):
+    return {
+        "type": kind, "message": text, "source": ORIGIN_RE.sub("", source or ""),
+        **{site: {"pages": 0, "occurrences": 0, "examples": []} for site in SITES},
+    }
+
+
+def read_index(path):
+    with open(path, encoding="utf-8") as f:
+        return json.load(f)
+
+
+def page_summary(console):
+    """Compact log cell for a page: '<type> <fingerprint> x<occurrences>' per distinct error."""
+    return " | ".join(f"{kind} {key} x{occurrences}" for key, (kind, _, _, occurrences) in console.errors.items())
+
+
+def merge_indexes(console_dir=CONSOLE_DIR):
+    """Entries of every process's index, summed per fingerprint."""
+    merged = {}
+    for path in sorted(glob.glob(os.path.join(console_dir, "errors*.json"))):
+        for key, entry in read_index(path).items():
+            if key not in merged:
+                merged[key] = entry
+                continue
+            for site in SITES:
+                counts = merged[key][site]
+                counts["pages"] += entry[site]["pages"]
+                counts["occurrences"] += entry[site]["occurrences"]
+                for example in entry[site]["examples"]:
+                    if len(counts["examples"]) < MAX_EXAMPLES and example not in counts["examples"]:
+                        counts["examples"].append(example)
+    return merged
+
+
+def status(entry):
+    if entry["test"]["pages"] and not entry["reference"]["pages"]:
+        return "new"
+    if entry["reference"]["pages"] and not entry["test"]["pages"]:
+        return "gone"
+    return "both"
+
+
+def write_error_index(console_dir=CONSOLE_DIR):
+    """Write index.json and index.md of every indexed error; returns the path of the Markdown index."""
+    order = {"new": 0, "both": 1, "gone": 2}
+    errors = [
+        {"fingerprint": key, "status": status(entry), **entry}
+        for key, entry in merge_indexes(console_dir).items()
+    ]
+    errors.sort(key=lambda e: (order[e["status"]], -e["test"]["pages"], -e["reference"]["pages"]))
+    with open(os.path.join(console_dir, "index.json"), "w", encoding="utf-8") as f:
+        json.dump(errors, f, indent=2)
+
+    lines = [
+        "# Console errors", "",
+        f"{len(errors)} unique errors and warnings; "
+        f"{sum(1 for e in errors if e['status'] == 'new')} only on the test site.", "",
+        "| status | type | message | reference pages | test pages | example |",
+        "|---|---|---|---|---|---|",
+    ]
+    for e in errors:
+        message = e["message"].replace("|", "\\|").replace("\n", " ")[:200]
+        example = (e["test"]["examples"] or e["reference"]["examples"] or [""])[0]
+        lines.append(f"| {e['status']} | {e['type']} | {message} | {e['reference']['pages']} | "
+                     f"{e['test']['pages']} | {example} |")
+    markdown_path = os.path.join(console_dir, "index.md")
+    with open(markdown_path, "w", encoding="utf-8") as f:
+        f.write("\n".join(lines) + "\n")
+    return markdown_path
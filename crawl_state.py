@@ -0,0 +1,377 @@
+"""Persistent page state for resumable and incremental crawls.
+
+Every request the spider schedules is recorded as "queued" for the current
+run and moved to "done", "skipped" or "failed" once handled, keyed by
+(phase, normalized URL); the final URL of a redirect handled under its
+source URL is an "alias". Rows survive between runs so that:
+
+* --resume picks the last unfinished run back up: its done pages count as
+  already seen and its queued pages are scheduled again.
+* --incremental can compare a page's current content hash and
+  ETag/Last-Modified against what the previous run recorded.
+* --distributed workers share the file as their frontier: they claim
+  queued pages under a lease, and the (phase, normalized URL) key keeps
+  each page to a single render per phase across all of them. On a local
+  disk the file is shared in WAL mode; workers on other machines share a
+  file on shared storage opened with shared=True (a rollback journal, see
+  sqlite_store.connect).
+
+With --sample-per-template, the run's sampling decisions are kept here
+too: every worker admits pages against the same per-template counts, and
+the frontier hands out pages of templates with fewer admitted pages first.
+
+The pages of the current run also serve as the exact seen-set for
+enqueue-time deduplication; is_seen puts a fixed-size Bloom filter and a
+small cache of recent hits in front of it, so most lookups never touch the
+database and memory does not grow with the number of links.
+"""
+import hashlib
+import json
+import os
+import re
+import sqlite3
+import time
+from collections import OrderedDict
+
+from bloom import BloomFilter
+from sqlite_store import BatchedCommits, connect
+
+DEFAULT_PATH = os.path.join("output", "crawl_state.sqlite")
+
+# Claimed pages not finished within this many seconds go back to other workers.
+CLAIM_LEASE = 600
+
+# Pages per run the seen-set's Bloom filter is sized for (about 1.8 MB per million at 0.1%).
+SEEN_CAPACITY = 5_000_000
+SEEN_ERROR_RATE = 0.001
+
+# Recently confirmed duplicates kept in memory (menus repeat the same links on every page).
+RECENT_SEEN = 10_000
+
+# Per-request tokens that change on every page load without the content changing.
+VOLATILE_RE = re.compile(
+    rb'(name="form_build_id"\s+value="|name="form_token"\s+value="|"permissionsHash":")[^"]*'
+)
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS runs (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    started_at REAL NOT NULL,
+    finished_at REAL,
+    mode TEXT
+);
+CREATE TABLE IF NOT EXISTS pages (
+    phase INTEGER NOT NULL,
+    url_key TEXT NOT NULL,
+    url TEXT NOT NULL,
+    depth INTEGER NOT NULL DEFAULT 0,
+    status TEXT NOT NULL,
+    run_id INTEGER NOT NULL,
+    response_code INTEGER,
+    content_hash TEXT,
+    etag TEXT,
+    last_modified TEXT,
+    metrics TEXT,
+    links TEXT,
+    updated_at REAL NOT NULL,
+    PRIMARY KEY (phase, url_key)
+);
+CREATE INDEX IF NOT EXISTS pages_run_status ON pages (run_id, status);
+CREATE TABLE IF NOT EXISTS sampled_templates (
+    run_id INTEGER NOT NULL,
+    template TEXT NOT NULL,
+    discovered INTEGER NOT NULL DEFAULT 0,
+    admitted INTEGER NOT NULL DEFAULT 0,
+    PRIMARY KEY (run_id, template)
+);
+CREATE TABLE IF NOT EXISTS sampled_pages (
+    run_id INTEGER NOT NULL,
+    url_key TEXT NOT NULL,
+    rank INTEGER,
+    PRIMARY KEY (run_id, url_key)
+);
+"""
+
+# Columns added after the first schema, applied to existing state files.
+MIGRATIONS = {
+    "worker": "ALTER TABLE pages ADD COLUMN worker TEXT",
+    "claimed_at": "ALTER TABLE pages ADD COLUMN claimed_at REAL",
+    "screenshot_hash": "ALTER TABLE pages ADD COLUMN screenshot_hash TEXT",
+    "sample_rank": "ALTER TABLE pages ADD COLUMN sample_rank INTEGER NOT NULL DEFAULT 0",
+}
+
+
+def content_hash(body):
+    """sha256 of an HTML body with per-request form tokens blanked out."""
+    return hashlib.sha256(VOLATILE_RE.sub(rb"\1", body)).hexdigest()
+
+
+class CrawlState(BatchedCommits):
+    """SQLite-backed record of every page the crawl has scheduled or handled."""
+
+    def __init__(self, path=DEFAULT_PATH, seen_capacity=SEEN_CAPACITY, shared=False):
+        self.path = path
+        self.seen_capacity = seen_capacity
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        super().__init__(connect(path, shared=shared))
+        self.connection.row_factory = sqlite3.Row
+        self.connection.executescript(SCHEMA)
+        columns = {row["name"] for row in self.connection.execute("PRAGMA table_info(pages)")}
+        for column, statement in MIGRATIONS.items():
+            if column not in columns:
+                self.connection.execute(statement)
+        self.connection.commit()
+        self.run_id = None
+        self.seen = None
+        self.recent_seen = OrderedDict()
+
+    def begin_run(self, resume=False, mode=""):
+        """Start a new run, or continue the last unfinished one when resume is set.
+
+        Returns True if an unfinished run was resumed.
+        """
+        if resume:
+            row = self.connection.execute(
+                "SELECT id FROM runs WHERE finished_at IS NULL ORDER BY id DESC LIMIT 1"
+            ).fetchone()
+            if row:
+                self.run_id = row["id"]
+                self._load_seen()
+                return True
+        cursor = self.connection.execute(
+            "INSERT INTO runs (started_at, mode) VALUES (?, ?)", (time.time(), mode)
+        )
+        self.run_id = cursor.lastrowid
+        self.connection.commit()
+        self._load_seen()
+        return False
+
+    def join_run(self, run_id, schedule=None):
+        """Work on a run started by another process (a distributed crawl).
+
+        An open write transaction blocks the other workers, so it must not stay open
+        while the worker waits for anything. schedule(callback) should run callback
+        once the caller's current work is done (the event loop's call_soon): the
+        first write of a transaction schedules its commit, so the writes of one
+        callback share a commit. Without schedule every write is committed right away.
+        """
+        self.run_id = int(run_id)
+        self.commit_every = 1
+        self.schedule_commit = schedule
+        self._load_seen()
+
+    def finish_run(self):
+        self.connection.execute("UPDATE runs SET finished_at = ? WHERE id = ?", (time.time(), self.run_id))
+        self.connection.commit()
+
+    def close(self):
+        self.connection.commit()
+        self.connection.close()
+
+    def enqueue(self, phase, url_key, url, depth, worker=None, sample_rank=0):
+        """Record a scheduled request unless the page was already handled in this run.
+
+        With worker set the page is recorded as already claimed by that worker, so
+        other workers leave it alone. sample_rank orders claims (see admit_sample).
+        Returns False if the row was left unchanged (the page is already handled,
+        or claimed, in this run).
+        """
+        cursor = self.connection.execute(
+            """
+            INSERT INTO pages (phase, url_key, url, depth, status, run_id, worker, claimed_at, sample_rank, updated_at)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+            ON CONFLICT (phase, url_key) DO UPDATE SET
+                url = excluded.url, depth = excluded.depth, status = excluded.status,
+                run_id = excluded.run_id, worker = excluded.worker, claimed_at = excluded.claimed_at,
+                sample_rank = excluded.sample_rank, updated_at = excluded.updated_at
+            WHERE pages.run_id != excluded.run_id
+                OR (pages.status = 'queued' AND (excluded.depth < pages.depth OR excluded.worker IS NOT NULL))
+            """,
+            (phase, url_key, url, depth, "claimed" if worker else "queued", self.run_id, worker,
+             time.time() if worker else None, sample_rank, time.time()),
+        )
+        self.seen.add(f"{phase}:{url_key}")
+        self._written()
+        return cursor.rowcount > 0
+
+    def mark_done(self, phase, url_key, url, depth, response_code=None, content_hash=None,
+                  etag=None, last_modified=None, metrics=None, links=None, screenshot_hash=None):
+        """Record a handled page. Hash, validators and links left as None keep their previous values.
+
+        The screenshot hash always belongs to this render: None when it has no screenshot.
+        """
+        self.connection.execute(
+            """
+            INSERT INTO pages (phase, url_key, url, depth, status, run_id, response_code, content_hash,
+                               etag, last_modified, metrics, links, screenshot_hash, updated_at)
+            VALUES (?, ?, ?, ?, 'done', ?, ?, ?, ?, ?, ?, ?, ?, ?)
+            ON CONFLICT (phase, url_key) DO UPDATE SET
+                url = excluded.url, depth = excluded.depth, status = 'done', run_id = excluded.run_id,
+                response_code = COALESCE(excluded.response_code, pages.response_code),
+                content_hash = COALESCE(excluded.content_hash, pages.content_hash),
+                etag = COALESCE(excluded.etag, pages.etag),
+                last_modified = COALESCE(excluded.last_modified, pages.last_modified),
+                metrics = COALESCE(excluded.metrics, pages.metrics),
+                links = COALESCE(excluded.links, pages.links),
+                screenshot_hash = excluded.screenshot_hash,
+                updated_at = excluded.updated_at
+            """,
+            (
+                phase, url_key, url, depth, self.run_id, response_code, content_hash, etag, last_modified,
+                json.dumps(metrics) if metrics is not None else None,
+                json.dumps(links) if links is not None else None,
+                screenshot_hash,
+                time.time(),
+            ),
+        )
+        self.seen.add(f"{phase}:{url_key}")
+        self._written()
+
+    def mark_status(self, phase, url_key, status):
+        """Set a page to 'skipped', 'failed' or 'alias' for this run."""
+        self.connection.execute(
+            "UPDATE pages SET status = ?, run_id = ?, updated_at = ? WHERE phase = ? AND url_key = ?",
+            (status, self.run_id, time.time(), phase, url_key),
+        )
+        self._written()
+
+    def get(self, phase, url_key):
+        """Return the stored row for a page as a dict (links and metrics decoded), or None."""
+        row = self.connection.execute(
+            "SELECT * FROM pages WHERE phase = ? AND url_key = ?", (phase, url_key)
+        ).fetchone()
+        if row is None:
+            return None
+        page = dict(row)
+        page["links"] = json.loads(page["links"]) if page["links"] else []
+        page["metrics"] = json.loads(page["metrics"]) if page["metrics"] else {}
+        return page
+
+    def is_seen(self, phase, url_key):
+        """True if the page was already scheduled or handled in the current run."""
+        key = f"{phase}:{url_key}"
+        if key not in self.seen:
+            return False
+        if key in self.recent_seen:
+            self.recent_seen.move_to_end(key)
+            return True
+        row = self.connection.execute(
+            "SELECT 1 FROM pages WHERE phase = ? AND url_key = ? AND run_id = ?", (phase, url_key, self.run_id)
+        ).fetchone()
+        if row is None:
+            return False
+        self.recent_seen[key] = True
+        if len(self.recent_seen) > RECENT_SEEN:
+            self.recent_seen.popitem(last=False)
+        return True
+
+    def _load_seen(self):
+        """Rebuild the Bloom filter from the pages of the current run."""
+        self.seen = BloomFilter(self.seen_capacity, SEEN_ERROR_RATE)
+        self.recent_seen.clear()
+        for phase, url_key in self.connection.execute(
+            "SELECT phase, url_key FROM pages WHERE run_id = ?", (self.run_id,)
+        ):
+            self.seen.add(f"{phase}:{url_key}")
+
+    def queued(self):
+        """Pages scheduled but not handled in the current run, shallowest first."""
+        rows = self.connection.execute(
+            "SELECT phase, url, depth FROM pages WHERE run_id = ? AND status IN ('queued', 'claimed') "
+            "ORDER BY depth, phase",
+            (self.run_id,),
+        )
+        return [dict(row) for row in rows]
+
+    def claim(self, worker, limit, phase=None):
+        """Atomically take up to limit queued pages (or expired claims) for worker, optionally of one phase.
+
+        Test pages go first so that pairs complete early; then pages of templates with
+        fewer sampled pages (sample_rank), and shallow pages before deep ones.
+        """
+        self.commit()
+        now = time.time()
+        self.connection.execute("BEGIN IMMEDIATE")
+        try:
+            rows = self.connection.execute(
+                """
+                UPDATE pages SET status = 'claimed', worker = ?, claimed_at = ?, updated_at = ?
+                WHERE rowid IN (
+                    SELECT rowid FROM pages
+                    WHERE run_id = ? AND (status = 'queued' OR (status = 'claimed' AND claimed_at < ?))
+                        AND (? IS NULL OR phase = ?)
+                    ORDER BY phase DESC, sample_rank, depth
+                    LIMIT ?
+                )
+                RETURNING phase, url, depth
+                """,
+                (worker, now, now, self.run_id, now - CLAIM_LEASE, phase, phase, limit),
+            ).fetchall()
+            self.connection.commit()
+        except Exception:
+            self.connection.rollback()
+            raise
+        return [dict(row) for row in rows]
+
+    def admit_sample(self, template, key, limit):
+        """Admit a page (path and query) of a URL template unless limit pages of it were admitted in this run.
+
+        Returns the page's rank within its template (0 for the first one) or None
+        if it is left out. A page keeps the first decision taken for it, in any worker.
+        """
+        cursor = self.connection.execute(
+            "INSERT INTO sampled_pages (run_id, url_key) VALUES (?, ?) ON CONFLICT DO NOTHING", (self.run_id, key)
+        )
+        if cursor.rowcount == 0:
+            row = self.connection.execute(
+                "SELECT rank FROM sampled_pages WHERE run_id = ? AND url_key = ?", (self.run_id, key)
+            ).fetchone()
+            return row["rank"]
+        # The insert holds the write lock, so no other worker counts a page of the template in between.
+        admitted = self.connection.execute(
+            """
+            INSERT INTO sampled_templates (run_id, template, discovered) VALUES (?, ?, 1)
+            ON CONFLICT (run_id, template) DO UPDATE SET discovered = discovered + 1
+            RETURNING admitted
+            """,
+            (self.run_id, template),
+        ).fetchone()["admitted"]
+        rank = None
+        if admitted < limit:
+            rank = admitted
+            self.connection.execute(
+                "UPDATE sampled_templates SET admitted = admitted + 1 WHERE run_id = ? AND template = ?",
+                (self.run_id, template),
+            )
+            self.connection.execute(
+                "UPDATE sampled_pages SET rank = ? WHERE run_id = ? AND url_key = ?", (rank, self.run_id, key)
+            )
+        self._written()
+        return rank
+
+    def sample_coverage(self):
+        """(template, discovered pages, admitted pages) of every URL template sampled in the current run."""
+        self.commit()
+        rows = self.connection.execute(
+            "SELECT template, discovered, admitted FROM sampled_templates WHERE run_id = ?", (self.run_id,)
+        )
+        return [tuple(row) for row in rows]
+
+    def release_claims(self):
+        """Put pages claimed in the current run back in the queue (after an interrupted single-process run)."""
+        self.connection.execute(
+            "UPDATE pages SET status = 'queued', worker = NULL, claimed_at = NULL "
+            "WHERE run_id = ? AND status = 'claimed'",
+            (self.run_id,),
+        )
+        self.commit()
+
+    def outstanding(self, phase=None):
+        """Pages of the current run (optionally of one phase) that are queued or still being worked on."""
+        self.commit()
+        row = self.connection.execute(
+            "SELECT COUNT(*) AS count FROM pages WHERE run_id = ? AND status IN ('queued', 'claimed') "
+            "AND (? IS NULL OR phase = ?)",
+            (self.run_id, phase, phase),
+        ).fetchone()
+        return row["count"]
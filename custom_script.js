@@ -1,27 +1,36 @@
 (() => {
-    // Initialize a global array to store console messages.
-    window.__consoleMessages = [];
-
-    // Save the original console methods.
-    const origError = console.error;
-    const origWarn = console.warn;
-    const origLog = console.log;
-
-    // Override console.error to capture error messages.
-    console.error = function(...args) {
-        window.__consoleMessages.push({ type: 'error', text: args.join(' ') });
-        return origError.apply(console, args);
+    // Performance entries the metrics collector reads (page_metrics.py), observed from document start.
+    const perf = window.__perf = {
+        lcp: null, cls: 0, sessionValue: 0, sessionFirst: 0, sessionLast: 0, longTasks: [], lastResourceEnd: 0
     };
-
-    // Override console.warn to capture warning messages.
-    console.warn = function(...args) {
-        window.__consoleMessages.push({ type: 'warning', text: args.join(' ') });
-        return origWarn.apply(console, args);
-    };
-
-    // Override console.log to capture log messages.
-    console.log = function(...args) {
-        window.__consoleMessages.push({ type: 'log', text: args.join(' ') });
-        return origLog.apply(console, args);
+    const observe = (type, callback) => {
+        try {
+            new PerformanceObserver(list => list.getEntries().forEach(callback)).observe({ type, buffered: true });
+        } catch (e) {
+            // Entry type not supported by this browser.
+        }
     };
+    observe('largest-contentful-paint', entry => {
+        perf.lcp = entry.renderTime || entry.loadTime || entry.startTime;
+    });
+    // CLS is the largest session window of shifts (at most 1s apart, 5s long), as in web-vitals.
+    observe('layout-shift', entry => {
+        if (entry.hadRecentInput) {
+            return;
+        }
+        if (perf.sessionValue && entry.startTime - perf.sessionLast < 1000 && entry.startTime - perf.sessionFirst < 5000) {
+            perf.sessionValue += entry.value;
+        } else {
+            perf.sessionValue = entry.value;
+            perf.sessionFirst = entry.startTime;
+        }
+        perf.sessionLast = entry.startTime;
+        perf.cls = Math.max(perf.cls, perf.sessionValue);
+    });
+    observe('longtask', entry => {
+        perf.longTasks.push([entry.startTime, entry.duration]);
+    });
+    observe('resource', entry => {
+        perf.lastResourceEnd = Math.max(perf.lastResourceEnd, entry.responseEnd);
+    });
 })();
\ No newline at end of file
@@ -0,0 +1,91 @@
+"""Plain HTTP or headless browser: the per-page fetch decision of --fetch hybrid.
+
+Every page is first fetched with Scrapy's HTTP downloader. The worker that
+writes its outputs also inspects the static HTML (requires_browser) and
+returns a small signature of it (its links and amount of text). The page
+then goes to the browser when:
+
+* the static HTML looks client-side rendered (an empty app mount point, a
+  "please enable JavaScript" notice, scripts but hardly any text) or matches
+  one of the --render-selectors;
+* its URL pattern is still being sampled: the first pages of every pattern
+  are rendered too and their rendered signature compared with the static one;
+* a sample of its URL pattern rendered differently from its static HTML.
+
+Patterns whose samples all matched are served from the static fetch from
+then on. A page's pattern is its URL template (url_templates.py), the same
+one that groups pages for --sample-per-template and the performance summary.
+"""
+
+# Pages of a URL pattern rendered in both ways before trusting the static HTML.
+SAMPLES_PER_PATTERN = 3
+
+# Relative difference in text length tolerated between the static and the rendered page.
+TEXT_TOLERANCE = 0.1
+
+# Ids of the elements single-page apps mount into.
+APP_ROOT_IDS = ("root", "app", "__next", "___gatsby", "__nuxt")
+
+# Less visible text than this, with scripts on the page, suggests the content is rendered client-side.
+MIN_STATIC_TEXT = 200
+
+
+def requires_browser(tree, selectors=()):
+    """Reason why the static tree needs a browser to be complete, or None."""
+    for selector in selectors:
+        if tree.select_one(selector) is not None:
+            return "selector"
+    for element_id in APP_ROOT_IDS:
+        root = tree.find(id=element_id)
+        if root is not None and not root.get_text(strip=True):
+            return "app_root"
+    for noscript in tree.find_all("noscript"):
+        if "javascript" in noscript.get_text().lower():
+            return "noscript"
+    body = tree.body
+    if body is not None and tree.find("script") is not None and len(body.get_text(" ", strip=True)) < MIN_STATIC_TEXT:
+        return "no_text"
+    return None
+
+
+def page_signature(tree, links):
+    """What the static and the rendered page are compared on: their links and how much text they have."""
+    body = tree.body or tree
+    return {"links": sorted(set(links)), "text_length": len(body.get_text(" ", strip=True))}
+
+
+def signatures_differ(static, rendered):
+    if static["links"] != rendered["links"]:
+        return True
+    longest = max(static["text_length"], rendered["text_length"], 1)
+    return abs(static["text_length"] - rendered["text_length"]) / longest > TEXT_TOLERANCE
+
+
+class FetchStrategy:
+    """What has been learned about each URL pattern during the crawl."""
+
+    def __init__(self, templates):
+        """templates is the crawl's UrlTemplates."""
+        self.templates = templates
+        self.samples = {}
+        self.differs = set()
+
+    def render_reason(self, url, static_reason):
+        """Why the page needs the browser (None if the static fetch will do)."""
+        if static_reason:
+            return static_reason
+        pattern = self.templates.template(url)
+        if pattern in self.differs:
+            return "pattern_differs"
+        # Counted when the sample is started, so concurrent pages of a new pattern don't all become samples.
+        if self.samples.get(pattern, 0) < SAMPLES_PER_PATTERN:
+            self.samples[pattern] = self.samples.get(pattern, 0) + 1
+            return "sampling"
+        return None
+
+    def learn(self, url, static, rendered):
+        """Record a sampled page; returns True if its rendered page differs from the static one."""
+        if signatures_differ(static, rendered):
+            self.differs.add(self.templates.template(url))
+            return True
+        return False
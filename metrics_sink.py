@@ -0,0 +1,238 @@
+"""Typed per-page metrics records and the end-of-run performance summary.
+
+MetricsSink buffers one record per handled page and writes them in batches
+to output/metrics as JSON Lines (default) or Parquet (needs pyarrow).
+write_summary reads the records back and writes summary.json and
+summary.md with:
+
+* p50/p90/p99 of every timing per phase (reference/test) and per URL template;
+* the test-minus-reference delta of every paired URL fetched the same way
+  (both over plain HTTP or both in the browser);
+* regressions: paired URLs whose test timing exceeds the reference by more
+  than the threshold (relative) and REGRESSION_MIN_MS (absolute).
+"""
+import glob
+import json
+import logging
+import os
+
+try:
+    import numpy as np
+except ImportError:  # percentiles are computed in pure Python
+    np = None
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:  # Parquet output is optional
+    pa = None
+    pq = None
+
+from postprocess import OUTPUT_DIR
+
+logger = logging.getLogger(__name__)
+
+METRICS_DIR = os.path.join(OUTPUT_DIR, "metrics")
+
+# Records buffered before a write.
+BATCH_SIZE = 500
+
+TIMINGS = ("ttfb", "dom_content_loaded", "load_event", "network_idle", "fcp", "lcp", "tbt")
+SIZES = ("transfer_bytes", "resource_count", "resource_bytes")
+PERCENTILES = (50, 90, 99)
+
+# Metrics a paired URL can regress on, and the absolute difference (ms) below which it is noise.
+REGRESSION_METRICS = ("ttfb", "load_event", "fcp", "lcp", "tbt")
+REGRESSION_MIN_MS = 50
+
+FIELDS = {
+    "timestamp": "string",
+    "phase": "string",
+    "domain": "string",
+    "url": "string",
+    "path": "string",
+    "url_pattern": "string",
+    "response_code": "int64",
+    "fetch": "string",
+    **{name: "float64" for name in TIMINGS},
+    "cls": "float64",
+    **{name: "int64" for name in SIZES},
+    "console_messages": "int64",
+    "console_errors": "int64",
+    "watchdog_errors": "string",
+}
+
+
+class MetricsSink:
+    """Buffered writer of page records, one file per process."""
+
+    def __init__(self, metrics_dir=METRICS_DIR, format="jsonl", append=False, suffix=""):
+        if format == "parquet" and pa is None:
+            logger.warning("pyarrow is not installed; writing metrics as JSON Lines instead of Parquet.")
+            format = "jsonl"
+        self.format = format
+        self.metrics_dir = metrics_dir
+        os.makedirs(metrics_dir, exist_ok=True)
+        if not append:
+            for path in glob.glob(os.path.join(metrics_dir, "pages*")):
+                os.remove(path)
+        self.path = os.path.join(metrics_dir, f"pages{suffix}.{format}")
+        if format == "parquet" and os.path.exists(self.path):
+            # A Parquet file can't be appended to; a resumed run adds a part next to it.
+            base = self.path[:-len(".parquet")]
+            self.path = next(f"{base}-{n}.parquet" for n in range(1, 10000) if not os.path.exists(f"{base}-{n}.parquet"))
+        self.buffer = []
+        self.handle = None
+        self.writer = None
+
+    def add(self, record):
+        self.buffer.append({name: record.get(name) for name in FIELDS})
+        if len(self.buffer) >= BATCH_SIZE:
+            self.flush()
+
+    def flush(self):
+        if not self.buffer:
+            return
+        if self.format == "parquet":
+            table = pa.Table.from_pylist(self.buffer, schema=parquet_schema())
+            if self.writer is None:
+                self.writer = pq.ParquetWriter(self.path, table.schema)
+            self.writer.write_table(table)
+        else:
+            if self.handle is None:
+                self.handle = open(self.path, "a", encoding="utf-8")
+            self.handle.write("".join(json.dumps(record) + "\n" for record in self.buffer))
+            self.handle.flush()
+        self.buffer = []
+
+    def close(self):
+        self.flush()
+        if self.writer is not None:
+            self.writer.close()
+        if self.handle is not None:
+            self.handle.close()
+
+
+def parquet_schema():
+    return pa.schema([(name, getattr(pa, kind)()) for name, kind in FIELDS.items()])
+
+
+def read_records(metrics_dir=METRICS_DIR):
+    """Latest record per (phase, url) from every pages file (a resumed run may handle a page twice)."""
+    latest = {}
+    for path in sorted(glob.glob(os.path.join(metrics_dir, "pages*"))):
+        if path.endswith(".parquet"):
+            if pq is None:
+                logger.warning(f"Skipping {path}: pyarrow is not installed.")
+                continue
+            records = pq.read_table(path).to_pylist()
+        else:
+            with open(path, encoding="utf-8") as f:
+                records = [json.loads(line) for line in f if line.strip()]
+        for record in records:
+            latest[(record["phase"], record["url"])] = record
+    return list(latest.values())
+
+
+def percentiles(values, ranks):
+    """Percentiles of values with linear interpolation, like numpy.percentile."""
+    if np is not None:
+        return [float(v) for v in np.percentile(values, ranks)]
+    values = sorted(values)
+    result = []
+    for rank in ranks:
+        position = (len(values) - 1) * rank / 100
+        low = int(position)
+        high = min(low + 1, len(values) - 1)
+        result.append(values[low] + (values[high] - values[low]) * (position - low))
+    return result
+
+
+def distribution(records, metrics):
+    """Count and percentiles of each metric over the records that have it."""
+    result = {"pages": len(records)}
+    for name in metrics:
+        values = [float(record[name]) for record in records if record.get(name) is not None]
+        if values:
+            result[name] = {f"p{p}": round(v, 4) for p, v in zip(PERCENTILES, percentiles(values, PERCENTILES))}
+    return result
+
+
+def pair_deltas(records, threshold):
+    """Test-minus-reference deltas per paired path, with the metrics that regressed."""
+    by_path = {}
+    for record in records:
+        by_path.setdefault(record["path"], {})[record["phase"]] = record
+    pairs = []
+    for path, sides in sorted(by_path.items()):
+        reference, test = sides.get("reference"), sides.get("test")
+        # A static fetch's TTFB is its download time, not comparable with a rendered page's.
+        if not (reference and test) or reference.get("fetch") != test.get("fetch"):
+            continue
+        delta, regressions = {}, []
+        for name in TIMINGS + ("cls",) + SIZES:
+            if reference.get(name) is None or test.get(name) is None:
+                continue
+            delta[name] = round(test[name] - reference[name], 4)
+            if (name in REGRESSION_METRICS and delta[name] > REGRESSION_MIN_MS
+                    and delta[name] > threshold * max(reference[name], 1)):
+                regressions.append(name)
+        pairs.append({"path": path, "url_pattern": test["url_pattern"], "delta": delta, "regressions": regressions})
+    return pairs
+
+
+def summarize(records, threshold=0.2):
+    metrics = TIMINGS + ("cls",) + SIZES
+    phases, patterns = {}, {}
+    for record in records:
+        phases.setdefault(record["phase"], []).append(record)
+        patterns.setdefault((record["phase"], record["url_pattern"]), []).append(record)
+    pairs = pair_deltas(records, threshold)
+    return {
+        "regression_threshold": threshold,
+        "phases": {phase: distribution(rows, metrics) for phase, rows in sorted(phases.items())},
+        "url_patterns": [
+            {"phase": phase, "url_pattern": pattern, **distribution(rows, TIMINGS)}
+            for (phase, pattern), rows in sorted(patterns.items())
+        ],
+        "pairs": pairs,
+        "regressions": [pair for pair in pairs if pair["regressions"]],
+    }
+
+
+def render_markdown(summary):
+    lines = ["# Performance summary", ""]
+    for phase, stats in summary["phases"].items():
+        lines += [f"## {phase} ({stats['pages']} pages)", "", "| metric | p50 | p90 | p99 |", "| --- | --- | --- | --- |"]
+        for name, values in stats.items():
+            if name != "pages":
+                lines.append(f"| {name} | " + " | ".join(str(values[f"p{p}"]) for p in PERCENTILES) + " |")
+        lines.append("")
+    lines += ["## Load event by URL template", "", "| phase | template | pages | p50 | p90 | p99 |",
+              "| --- | --- | --- | --- | --- | --- |"]
+    for row in summary["url_patterns"]:
+        load = row.get("load_event") or row.get("ttfb") or {}
+        lines.append(f"| {row['phase']} | {row['url_pattern']} | {row['pages']} | "
+                     + " | ".join(str(load.get(f"p{p}", "")) for p in PERCENTILES) + " |")
+    regressions = summary["regressions"]
+    lines += ["", f"## Regressions ({len(regressions)} of {len(summary['pairs'])} pairs, "
+                  f"threshold {summary['regression_threshold']:.0%})", ""]
+    if regressions:
+        lines += ["| path | regressed | delta (ms) |", "| --- | --- | --- |"]
+        for pair in regressions:
+            deltas = ", ".join(f"{name} +{pair['delta'][name]:.0f}" for name in pair["regressions"])
+            lines.append(f"| {pair['path']} | {', '.join(pair['regressions'])} | {deltas} |")
+    else:
+        lines.append("None.")
+    return "\n".join(lines) + "\n"
+
+
+def write_summary(metrics_dir=METRICS_DIR, threshold=0.2):
+    """Summarize every record in metrics_dir; returns the path of the Markdown summary."""
+    summary = summarize(read_records(metrics_dir), threshold)
+    with open(os.path.join(metrics_dir, "summary.json"), "w", encoding="utf-8") as f:
+        json.dump(summary, f, indent=2)
+    markdown_path = os.path.join(metrics_dir, "summary.md")
+    with open(markdown_path, "w", encoding="utf-8") as f:
+        f.write(render_markdown(summary))
+    return markdown_path
@@ -0,0 +1,242 @@
+"""Reference/test comparison of the saved Markdown and screenshots.
+
+compare_pair runs in the post-processing worker pool as soon as the test
+half of a pair has been saved. DiffReport streams each result to
+output/report/diff.jsonl and writes output/report/index.html at the end
+of the crawl.
+
+Artifacts are output file paths, or their content when they come from the
+artifact store (--output-store blobs).
+"""
+import difflib
+import html
+import io
+import json
+import os
+
+try:
+    import numpy as np
+    from PIL import Image
+except ImportError:  # screenshot diffs are skipped without numpy/Pillow
+    np = None
+    Image = None
+
+from artifact_store import read_blob
+from screenshots import hash_distance
+from postprocess import OUTPUT_DIR, get_output_filepath
+
+REPORT_DIR = os.path.join(OUTPUT_DIR, "report")
+
+# Unified diff lines kept per page in the report.
+MAX_DIFF_LINES = 200
+
+# Fill value for the area outside the smaller screenshot; far enough from 0-255 to always count as changed.
+OUTSIDE = -1000
+
+
+def available(source):
+    """A stored artifact's content, or the path of a file that exists."""
+    return isinstance(source, bytes) or (source is not None and os.path.exists(source))
+
+
+def read_text(source):
+    if isinstance(source, bytes):
+        return source.decode("utf-8", errors="replace").splitlines()
+    with open(source, encoding="utf-8", errors="replace") as f:
+        return f.read().splitlines()
+
+
+def diff_text(reference_path, test_path):
+    """Line diff of two Markdown files."""
+    if not (available(reference_path) and available(test_path)):
+        return {"error": "missing text file"}
+    reference, test = read_text(reference_path), read_text(test_path)
+    if reference == test:
+        return {"changed": False, "similarity": 1.0, "added": 0, "removed": 0, "diff": []}
+    diff = list(difflib.unified_diff(reference, test, "reference", "test", lineterm="", n=1))
+    return {
+        "changed": True,
+        "similarity": round(difflib.SequenceMatcher(None, reference, test, autojunk=False).ratio(), 4),
+        "added": sum(1 for line in diff if line.startswith("+") and not line.startswith("+++")),
+        "removed": sum(1 for line in diff if line.startswith("-") and not line.startswith("---")),
+        "diff": diff[:MAX_DIFF_LINES],
+    }
+
+
+def load_rgb(source):
+    with Image.open(io.BytesIO(source) if isinstance(source, bytes) else source) as image:
+        return np.asarray(image.convert("RGB"), dtype=np.int16)
+
+
+def diff_screenshots(reference_path, test_path, diff_path, threshold=8):
+    """Pixel diff of two screenshots.
+
+    A pixel counts as changed when any channel differs by more than threshold.
+    Images of different sizes are compared on the larger canvas, so extra
+    height on either side counts as changed. The diff image keeps the test
+    screenshot dimmed with changed pixels in red.
+    """
+    if np is None:
+        return {"error": "numpy and Pillow are required for screenshot diffs"}
+    if not (available(reference_path) and available(test_path)):
+        return {"error": "missing screenshot"}
+    reference, test = load_rgb(reference_path), load_rgb(test_path)
+    size_reference = [int(reference.shape[1]), int(reference.shape[0])]
+    size_test = [int(test.shape[1]), int(test.shape[0])]
+    height = max(reference.shape[0], test.shape[0])
+    width = max(reference.shape[1], test.shape[1])
+    if reference.shape != test.shape:
+        reference = np.pad(reference, ((0, height - reference.shape[0]), (0, width - reference.shape[1]), (0, 0)),
+                           constant_values=OUTSIDE)
+        test = np.pad(test, ((0, height - test.shape[0]), (0, width - test.shape[1]), (0, 0)), constant_values=OUTSIDE)
+    changed = (np.abs(reference - test) > threshold).any(axis=2)
+    changed_pixels = int(changed.sum())
+    result = {
+        "changed": changed_pixels > 0,
+        "changed_ratio": round(changed_pixels / changed.size, 6) if changed.size else 0.0,
+        "changed_pixels": changed_pixels,
+        "size_reference": size_reference,
+        "size_test": size_test,
+    }
+    if changed_pixels:
+        overlay = (np.clip(test, 0, 255) // 3).astype(np.uint8)
+        overlay[changed] = (255, 0, 0)
+        os.makedirs(os.path.dirname(diff_path), exist_ok=True)
+        Image.fromarray(overlay).save(diff_path)
+        result["diff_image"] = diff_path
+    return result
+
+
+def compare_pair(url, screenshot_ext=None, pixel_threshold=8, store=None, blobs=None, screenshot_hashes=None):
+    """Compare the reference and test artifacts saved for url (the test URL).
+
+    With store set, they are read from the artifact store: blobs maps each
+    folder to the {kind: blob} stored for the pair. Screenshots whose
+    perceptual hashes (screenshot_hashes, per folder) are equal are not
+    compared pixel by pixel: their result is skipped by hash, without pixel counts.
+    """
+    def artifact(folder, kind, subfolder, ext):
+        if store is None:
+            return get_output_filepath(folder, url, subfolder, ext)
+        blob = blobs.get(folder, {}).get(kind)
+        return read_blob(store, blob) if blob else None
+
+    result = {
+        "url": url,
+        "text": diff_text(artifact("reference", "text", "text", ".md"), artifact("test", "text", "text", ".md")),
+    }
+    hashes = screenshot_hashes or {}
+    reference_hash, test_hash = hashes.get("reference"), hashes.get("test")
+    if screenshot_ext and reference_hash and reference_hash == test_hash:
+        result["screenshot"] = {"changed": False, "skipped": "hash"}
+    elif screenshot_ext:
+        result["screenshot"] = diff_screenshots(
+            artifact("reference", "screenshot", "screenshots", screenshot_ext),
+            artifact("test", "screenshot", "screenshots", screenshot_ext),
+            get_output_filepath("diff", url, "screenshots", ".png"),
+            threshold=pixel_threshold,
+        )
+        if reference_hash and test_hash:
+            result["screenshot"]["hash_distance"] = hash_distance(reference_hash, test_hash)
+    return result
+
+
+class DiffReport:
+    """Streams pair comparisons to JSON Lines and renders an HTML summary."""
+
+    def __init__(self, report_dir=REPORT_DIR, append=False):
+        self.report_dir = report_dir
+        os.makedirs(report_dir, exist_ok=True)
+        self.jsonl_path = os.path.join(report_dir, "diff.jsonl")
+        self.html_path = os.path.join(report_dir, "index.html")
+        self.handle = open(self.jsonl_path, "a" if append else "w", encoding="utf-8")
+
+    def add(self, result):
+        self.handle.write(json.dumps(result) + "\n")
+        self.handle.flush()
+
+    def close(self):
+        self.handle.close()
+        self.write_html()
+
+    def results(self):
+        """Latest result per URL from the JSON Lines file (resumed and incremental crawls append to it)."""
+        latest = {}
+        with open(self.jsonl_path, encoding="utf-8") as f:
+            for line in f:
+                if line.strip():
+                    result = json.loads(line)
+                    latest[result["url"]] = result
+        return list(latest.values())
+
+    def write_html(self):
+        results = sorted(self.results(), key=sort_key)
+        changed = sum(1 for result in results if is_changed(result))
+        rows = "\n".join(render_row(result, self.report_dir) for result in results)
+        with open(self.html_path, "w", encoding="utf-8") as f:
+            f.write(HTML_TEMPLATE.format(total=len(results), changed=changed, rows=rows))
+
+
+def is_changed(result):
+    return result["text"].get("changed") or result.get("screenshot", {}).get("changed")
+
+
+def sort_key(result):
+    """Most changed pages first."""
+    return (
+        -result.get("screenshot", {}).get("changed_ratio", 0),
+        result["text"].get("similarity", 1.0),
+        result["url"],
+    )
+
+
+def render_row(result, report_dir):
+    text = result["text"]
+    screenshot = result.get("screenshot", {})
+    if "error" in text:
+        text_cell = html.escape(text["error"])
+    elif text["changed"]:
+        diff = html.escape("\n".join(text["diff"]))
+        text_cell = (f"{text['similarity']:.3f} (+{text['added']} / -{text['removed']})"
+                     f"<details><summary>diff</summary><pre>{diff}</pre></details>")
+    else:
+        text_cell = "identical"
+    if not screenshot:
+        screenshot_cell = ""
+    elif "error" in screenshot:
+        screenshot_cell = html.escape(screenshot["error"])
+    elif screenshot.get("skipped") == "hash":
+        screenshot_cell = "identical hash"
+    elif screenshot["changed"]:
+        image = html.escape(os.path.relpath(screenshot["diff_image"], report_dir))
+        screenshot_cell = f'<a href="{image}">{screenshot["changed_ratio"]:.2%}</a>'
+    else:
+        screenshot_cell = "identical"
+    row_class = "changed" if is_changed(result) else ""
+    return (f'<tr class="{row_class}"><td>{html.escape(result["url"])}</td>'
+            f"<td>{text_cell}</td><td>{screenshot_cell}</td></tr>")
+
+
+HTML_TEMPLATE = """<!DOCTYPE html>
+<html lang="en">
+<head>
+<meta charset="utf-8">
+<title>Reference vs test</title>
+<style>
+body {{ font-family: sans-serif; margin: 2em; }}
+table {{ border-collapse: collapse; width: 100%; }}
+td, th {{ border: 1px solid #ccc; padding: 4px 8px; text-align: left; vertical-align: top; }}
+tr.changed td:first-child {{ border-left: 4px solid #c00; }}
+pre {{ white-space: pre-wrap; font-size: 12px; }}
+</style>
+</head>
+<body>
+<h1>Reference vs test</h1>
+<p>{changed} of {total} pages differ.</p>
+<table>
+<tr><th>URL</th><th>Text similarity</th><th>Changed pixels</th></tr>
+{rows}
+</table>
+</body>
+</html>
+"""
@@ -0,0 +1,94 @@
+"""One parsed view of a response, shared by every stage of page processing."""
+import codecs
+from html.parser import HTMLParser
+
+from bs4 import BeautifulSoup
+
+from text_extraction import clean_soup, soup_to_markdown_with_backend
+
+# How much of the body the lang scan decodes and feeds to the parser at a time.
+LANG_SCAN_CHUNK = 4096
+
+
+class _FirstTagReached(Exception):
+    pass
+
+
+class _HtmlLangScanner(HTMLParser):
+    """Reads <html lang> and stops at the first start tag."""
+
+    def __init__(self):
+        super().__init__(convert_charrefs=False)
+        self.lang = ""
+
+    def handle_starttag(self, tag, attrs):
+        if tag == "html":
+            self.lang = dict(attrs).get("lang") or ""
+        raise _FirstTagReached()
+
+
+def scan_html_lang(body, encoding="utf-8"):
+    """Return the lowercased <html lang> value, decoding only as much of body as needed."""
+    scanner = _HtmlLangScanner()
+    decoder = codecs.getincrementaldecoder(encoding)(errors="replace")
+    try:
+        for start in range(0, len(body), LANG_SCAN_CHUNK):
+            scanner.feed(decoder.decode(body[start:start + LANG_SCAN_CHUNK]))
+    except _FirstTagReached:
+        pass
+    return scanner.lang.strip().lower()
+
+
+class PageDocument:
+    """Lazily decoded and parsed page: the tree is built once with lxml and reused.
+
+    Link extraction reads the untouched tree; Markdown conversion then cleans
+    that same tree in place, so links are collected before the tree is consumed.
+    """
+
+    def __init__(self, body, url, encoding="utf-8"):
+        self.body = body
+        self.url = url
+        self.encoding = encoding
+        self._lang = None
+        self._text = None
+        self._tree = None
+        self._links = None
+        self._consumed = False
+
+    @classmethod
+    def from_response(cls, response):
+        return cls(response.body, response.request.url, response.encoding)
+
+    @property
+    def lang(self):
+        if self._lang is None:
+            self._lang = scan_html_lang(self.body, self.encoding)
+        return self._lang
+
+    @property
+    def text(self):
+        if self._text is None:
+            self._text = self.body.decode(self.encoding, errors="replace")
+        return self._text
+
+    @property
+    def tree(self):
+        if self._tree is None:
+            self._tree = BeautifulSoup(self.text, "lxml")
+        return self._tree
+
+    @property
+    def links(self):
+        """Every <a href> value in document order."""
+        if self._links is None:
+            if self._consumed:
+                raise RuntimeError("The tree was already cleaned; read links before converting to Markdown.")
+            self._links = [a["href"] for a in self.tree.find_all("a", href=True)]
+        return self._links
+
+    def markdown(self, backend="native"):
+        """Clean the shared tree in place and convert it; the tree is not reusable afterwards."""
+        self._links = self.links  # collect links while the attributes are still there
+        self._consumed = True
+        return soup_to_markdown_with_backend(clean_soup(self.tree), backend)
@@ -0,0 +1,101 @@
+"""Page load metrics collected in a single page.evaluate.
+
+custom_script.js observes paint, layout-shift, long task and resource
+entries from document start. COLLECT_SCRIPT waits inside the page for the
+idle criterion and returns everything at once: Navigation Timing Level 2,
+resource totals, FCP, LCP, CLS and TBT. Console messages are streamed
+from page events instead (console_errors.py).
+
+Idle criteria (--idle):
+
+* quiet:<ms>   the load event has fired and no resource finished for <ms>
+               (polled in the page, so no extra round trips);
+* networkidle  Playwright's networkidle state (one extra round trip);
+* load         no waiting beyond the load event Playwright already waited for.
+
+network_idle is the page time at which the last resource finished, never
+the time spent waiting for it.
+"""
+import logging
+
+logger = logging.getLogger(__name__)
+
+IDLE_CRITERIA = ("quiet:<ms>", "networkidle", "load")
+
+# Longest the in-page quiet wait may take before metrics are read anyway.
+QUIET_TIMEOUT_MS = 10000
+
+# Long tasks count towards TBT for the part above this.
+LONG_TASK_MS = 50
+
+EMPTY_METRICS = {
+    "ttfb": None, "dom_content_loaded": None, "load_event": None, "network_idle": None,
+    "fcp": None, "lcp": None, "cls": None, "tbt": None,
+    "transfer_bytes": None, "resource_count": None, "resource_bytes": None,
+}
+
+COLLECT_SCRIPT = """
+async ({quietMs, timeoutMs, longTaskMs}) => {
+    const perf = window.__perf || {lcp: null, cls: null, longTasks: [], lastResourceEnd: 0};
+    const lastActivity = () => {
+        const nav = performance.getEntriesByType('navigation')[0];
+        return Math.max(perf.lastResourceEnd || 0, nav ? nav.loadEventEnd : 0);
+    };
+    if (quietMs > 0) {
+        const started = performance.now();
+        await new Promise(resolve => {
+            const check = () => {
+                const now = performance.now();
+                const quiet = document.readyState === 'complete' && now - lastActivity() >= quietMs;
+                if (quiet || now - started >= timeoutMs) {
+                    resolve();
+                } else {
+                    setTimeout(check, Math.min(quietMs, 100));
+                }
+            };
+            check();
+        });
+    }
+    const nav = performance.getEntriesByType('navigation')[0];
+    const fcpEntry = performance.getEntriesByName('first-contentful-paint')[0];
+    const fcp = fcpEntry ? fcpEntry.startTime : null;
+    const resources = performance.getEntriesByType('resource');
+    const tbt = fcp === null ? null : perf.longTasks
+        .filter(([start]) => start >= fcp)
+        .reduce((total, [, duration]) => total + Math.max(0, duration - longTaskMs), 0);
+    const positive = value => (value > 0 ? value : null);
+    return {
+        ttfb: nav ? positive(nav.responseStart) : null,
+        dom_content_loaded: nav ? positive(nav.domContentLoadedEventEnd) : null,
+        load_event: nav ? positive(nav.loadEventEnd) : null,
+        network_idle: positive(lastActivity()),
+        fcp: fcp,
+        lcp: perf.lcp,
+        cls: perf.cls,
+        tbt: tbt,
+        transfer_bytes: nav ? nav.transferSize + resources.reduce((total, r) => total + r.transferSize, 0) : null,
+        resource_count: resources.length,
+        resource_bytes: resources.reduce((total, r) => total + r.encodedBodySize, 0),
+    };
+}
+"""
+
+
+def parse_idle(value):
+    """Validate an --idle value; returns (mode, quiet_ms)."""
+    if value in ("networkidle", "load"):
+        return value, 0
+    if value.startswith("quiet:") and value[len("quiet:"):].isdigit():
+        return "quiet", int(value[len("quiet:"):])
+    raise ValueError(f"Unknown idle criterion {value!r}; expected one of {', '.join(IDLE_CRITERIA)}")
+
+
+async def collect(page, idle="quiet:500"):
+    """Return the metrics of a loaded page. Timings are ms from navigation start."""
+    mode, quiet_ms = parse_idle(idle)
+    if mode == "networkidle":
+        await page.wait_for_load_state("networkidle")
+    result = await page.evaluate(
+        COLLECT_SCRIPT, {"quietMs": quiet_ms, "timeoutMs": QUIET_TIMEOUT_MS, "longTaskMs": LONG_TASK_MS}
+    )
+    return {**EMPTY_METRICS, **result}
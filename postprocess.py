@@ -0,0 +1,100 @@
+"""CPU-bound page post-processing that runs in worker processes.
+
+parse_page hands the raw body, URL, output folder and a small settings
+dict to process_page on a ProcessPoolExecutor. The worker parses the
+page once, writes the HTML and Markdown outputs and returns what the
+spider still needs (the links to follow), so the reactor thread only
+awaits the result.
+"""
+import multiprocessing
+import os
+import re
+from concurrent.futures import ProcessPoolExecutor
+from urllib.parse import urlparse
+
+from artifact_store import put_blob
+from fetch_strategy import page_signature, requires_browser
+from page_document import PageDocument
+from profiling import timed
+
+OUTPUT_DIR = "output"
+
+
+def create_executor(workers):
+    """Process pool for process_page. Workers are spawned so they never inherit browser or reactor threads."""
+    return ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context("spawn"))
+
+
+def sanitize_path(path):
+    return re.sub(r'[<>:"/\\|?*]', "_", path)
+
+
+def get_relative_path(url):
+    parsed = urlparse(url)
+    path = parsed.path.lstrip("/") or "index"
+    if parsed.query:
+        path += "_" + parsed.query
+    return path
+
+
+def get_output_filepath(folder, url, subfolder, default_ext):
+    """Path of an artifact for url, folder being 'reference' or 'test'."""
+    return os.path.join(OUTPUT_DIR, subfolder, folder, sanitize_path(get_relative_path(url)) + default_ext)
+
+
+def write_file(file_path, data, binary=False):
+    os.makedirs(os.path.dirname(file_path), exist_ok=True)
+    mode = "wb" if binary else "w"
+    with open(file_path, mode, encoding=None if binary else "utf-8") as f:
+        f.write(data)
+
+
+def process_page(body, url, encoding, folder, settings):
+    """Write the HTML and Markdown outputs for one page and return its links.
+
+    settings holds plain values only (it is pickled to the worker):
+    text_backend, follow_links, for --fetch hybrid inspect_static (the
+    render selectors, or None) and signature, for --profile profile (the
+    stage timings are returned in result["timings"]) and for --output-store
+    blobs store (the store root; the outputs go to blobs whose index entries
+    are returned in result["artifacts"]).
+    """
+    timings = [] if settings.get("profile") else None
+    store = settings.get("store")
+    document = PageDocument(body, url, encoding)
+    result = {"links": [], "markdown_error": None}
+    if store:
+        result["artifacts"] = {}
+
+    with timed(timings, "save_html"):
+        if store:
+            result["artifacts"]["html"] = put_blob(store, body)
+        else:
+            write_file(get_output_filepath(folder, url, "html", ".html"), body, binary=True)
+
+    if settings.get("follow_links") and body.strip():
+        with timed(timings, "links"):
+            result["links"] = document.links
+
+    # Read before the Markdown conversion cleans the tree.
+    if settings.get("inspect_static") is not None:
+        with timed(timings, "inspect_static"):
+            result["js_required"] = requires_browser(document.tree, settings["inspect_static"])
+    if settings.get("signature"):
+        result["signature"] = page_signature(document.tree, document.links)
+
+    with timed(timings, "markdown"):
+        try:
+            markdown_text = document.markdown(settings.get("text_backend", "native"))
+        except Exception as e:
+            result["markdown_error"] = str(e)
+            markdown_text = "Conversion failed."
+    with timed(timings, "save_markdown"):
+        if store:
+            result["artifacts"]["text"] = put_blob(store, markdown_text.encode("utf-8"))
+        else:
+            write_file(get_output_filepath(folder, url, "text", ".md"), markdown_text, binary=False)
+    if timings is not None:
+        result["timings"] = timings
+        result["pid"] = os.getpid()
+    return result
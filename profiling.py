@@ -0,0 +1,228 @@
+"""Opt-in timing spans and gauges for the crawl pipeline (--profile).
+
+Every parse_page call gets a lane (a trace thread) for its lifetime and
+records a span per stage on it: download, language, duplicate,
+performance_metrics, watchdog, log, screenshot, postprocess_wait, state,
+follow_links, release_page. The post-processing worker times its own stages
+(save_html, links, inspect_static, markdown, save_markdown) and returns them
+with its result; they are recorded on the worker's process. Gauges (queue
+depth, downloads and pages in flight, open browser pages, current RSS
+where /proc provides it, peak RSS) are sampled every SAMPLE_INTERVAL
+seconds.
+
+At the end of the crawl output/profile holds:
+
+* trace.json    Chrome trace event format (chrome://tracing, ui.perfetto.dev);
+* metrics.prom  Prometheus text format: a histogram per stage and the last
+                and highest value of every gauge.
+
+With profiling off, page_trace() returns NULL_TRACE, whose span() is a
+shared no-op context manager, and nothing is sampled.
+"""
+import contextlib
+import json
+import logging
+import os
+import resource
+import sys
+import time
+
+logger = logging.getLogger(__name__)
+
+PROFILE_DIR = os.path.join("output", "profile")
+
+# Seconds between gauge samples.
+SAMPLE_INTERVAL = 1.0
+
+# Trace events kept in memory; stage histograms keep counting past it.
+MAX_TRACE_EVENTS = 1_000_000
+
+# Upper bounds (s) of the stage histogram buckets.
+BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30)
+
+NULL_SPAN = contextlib.nullcontext()
+
+
+def now_us():
+    """Wall clock in microseconds: comparable between the crawler and its worker processes."""
+    return time.time_ns() // 1000
+
+
+def rss_bytes():
+    """Current resident set size of this process, or None where /proc is not available."""
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, IndexError):
+        return None
+
+
+def peak_rss_bytes():
+    """Highest resident set size of this process so far."""
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is in bytes on macOS and in KiB on Linux.
+    return peak if sys.platform == "darwin" else peak * 1024
+
+
+@contextlib.contextmanager
+def timed(timings, name):
+    """Append (name, start_us, duration_us) to timings; a no-op when timings is None."""
+    if timings is None:
+        yield
+        return
+    start = now_us()
+    try:
+        yield
+    finally:
+        timings.append((name, start, now_us() - start))
+
+
+class PageTrace:
+    """The spans of one page, recorded on the lane it holds."""
+
+    def __init__(self, profiler, lane, url):
+        self.profiler = profiler
+        self.lane = lane
+        self.url = url
+        self.start = now_us()
+
+    @contextlib.contextmanager
+    def span(self, name):
+        start = now_us()
+        try:
+            yield
+        finally:
+            self.profiler.record(name, start, now_us() - start, tid=self.lane)
+
+    def add_download(self, latency):
+        """The download, which ended when parse_page started (latency in seconds)."""
+        duration = int(latency * 1e6)
+        self.profiler.record("download", self.start - duration, duration, tid=self.lane)
+
+    def add_worker(self, future):
+        """Record the stage timings the post-processing worker returns with its result, once it is done."""
+        future.add_done_callback(self.worker_done)
+
+    def worker_done(self, future):
+        if future.cancelled() or future.exception() is not None:
+            return
+        result = future.result()
+        for name, start, duration in result.get("timings") or ():
+            self.profiler.record(name, start, duration, pid=result["pid"], tid=0)
+
+    def close(self):
+        self.profiler.record("parse_page", self.start, now_us() - self.start, tid=self.lane, args={"url": self.url})
+        self.profiler.free_lanes.append(self.lane)
+
+
+class NullTrace:
+    """Stands in for PageTrace when profiling is off."""
+
+    def span(self, name):
+        return NULL_SPAN
+
+    def add_download(self, latency):
+        pass
+
+    def add_worker(self, future):
+        pass
+
+    def close(self):
+        pass
+
+
+NULL_TRACE = NullTrace()
+
+
+class Profiler:
+    """Collects spans and gauge samples, and writes them out when closed."""
+
+    def __init__(self, enabled=False, output_dir=PROFILE_DIR, suffix=""):
+        self.enabled = enabled
+        self.output_dir = output_dir
+        self.suffix = suffix
+        self.pid = os.getpid()
+        self.events = []
+        self.dropped = 0
+        self.stages = {}
+        self.gauges = {}
+        self.free_lanes = []
+        self.lanes = 0
+        self.sampler = None
+
+    def page_trace(self, url):
+        if not self.enabled:
+            return NULL_TRACE
+        if self.free_lanes:
+            lane = self.free_lanes.pop()
+        else:
+            self.lanes += 1
+            lane = self.lanes
+            self.events.append({"name": "thread_name", "ph": "M", "pid": self.pid, "tid": lane,
+                                "args": {"name": f"page lane {lane}"}})
+        return PageTrace(self, lane, url)
+
+    def record(self, name, start, duration, pid=None, tid=0, args=None):
+        """Add a complete span (times in µs)."""
+        histogram = self.stages.setdefault(name, [0] * (len(BUCKETS) + 1) + [0.0])
+        seconds = duration / 1e6
+        histogram[next((i for i, bound in enumerate(BUCKETS) if seconds <= bound), len(BUCKETS))] += 1
+        histogram[-1] += seconds
+        if len(self.events) >= MAX_TRACE_EVENTS:
+            self.dropped += 1
+            return
+        event = {"name": name, "cat": "stage", "ph": "X", "ts": start, "dur": duration,
+                 "pid": self.pid if pid is None else pid, "tid": tid}
+        if args:
+            event["args"] = args
+        self.events.append(event)
+
+    def start_sampling(self, sample):
+        """Call sample() every SAMPLE_INTERVAL seconds; it returns the current {gauge: value}."""
+        if not self.enabled:
+            return
+        from twisted.internet import task
+
+        def record_sample():
+            values = sample()
+            for name, value in values.items():
+                last_max = self.gauges.get(name, (0, 0))[1]
+                self.gauges[name] = (value, max(value, last_max))
+            if len(self.events) < MAX_TRACE_EVENTS:
+                self.events.append({"name": "gauges", "ph": "C", "ts": now_us(), "pid": self.pid, "args": values})
+
+        self.sampler = task.LoopingCall(record_sample)
+        self.sampler.start(SAMPLE_INTERVAL)
+
+    def close(self):
+        """Stop sampling and write the trace and the Prometheus metrics; returns the trace path (None when off)."""
+        if self.sampler is not None and self.sampler.running:
+            self.sampler.stop()
+        if not self.enabled:
+            return None
+        if self.dropped:
+            logger.warning(f"Profile trace is truncated: {self.dropped} spans over {MAX_TRACE_EVENTS} were not kept.")
+        os.makedirs(self.output_dir, exist_ok=True)
+        trace_path = os.path.join(self.output_dir, f"trace{self.suffix}.json")
+        with open(trace_path, "w", encoding="utf-8") as f:
+            json.dump({"traceEvents": self.events, "displayTimeUnit": "ms"}, f)
+        with open(os.path.join(self.output_dir, f"metrics{self.suffix}.prom"), "w", encoding="utf-8") as f:
+            f.write(self.prometheus_text())
+        return trace_path
+
+    def prometheus_text(self):
+        lines = [
+            "# HELP crawler_stage_seconds Time spent in each crawl stage.",
+            "# TYPE crawler_stage_seconds histogram",
+        ]
+        for name, histogram in sorted(self.stages.items()):
+            cumulative = 0
+            for bound, count in zip(BUCKETS + ("+Inf",), histogram[:-1]):
+                cumulative += count
+                lines.append(f'crawler_stage_seconds_bucket{{stage="{name}",le="{bound}"}} {cumulative}')
+            lines.append(f'crawler_stage_seconds_sum{{stage="{name}"}} {histogram[-1]:.6f}')
+            lines.append(f'crawler_stage_seconds_count{{stage="{name}"}} {cumulative}')
+        for name, (value, highest) in sorted(self.gauges.items()):
+            lines += [f"# TYPE crawler_{name} gauge", f"crawler_{name} {value}",
+                      f"# TYPE crawler_{name}_max gauge", f"crawler_{name}_max {highest}"]
+        return "\n".join(lines) + "\n"
@@ -0,0 +1,125 @@
+"""Memory ceiling for long crawls (--memory-limit-mb).
+
+Every CHECK_INTERVAL seconds the governor measures the resident memory of
+the crawler and all its child processes (Chromium, the Playwright driver,
+the post-processing workers) and records it with the open page and context
+counts in the crawl stats. Over the limit, it pauses the engine so no new
+page starts, waits for the pages in flight to finish, then recycles the
+browser contexts: idle pooled pages and the contexts themselves are closed,
+which ends their renderer processes, and scrapy-playwright opens fresh
+contexts for the next requests. Then the crawl resumes. Contexts are never
+closed under a page in flight: a drain that takes longer than DRAIN_WARNING
+is reported and waited out.
+
+Current memory is read from /proc. Where there is none (macOS) the limit is
+disabled: getrusage only reports the peak RSS, which never goes down.
+"""
+import asyncio
+import gc
+import logging
+import os
+import time
+
+logger = logging.getLogger(__name__)
+
+# Seconds between memory checks.
+CHECK_INTERVAL = 5.0
+
+# Seconds of waiting for the pages in flight after which the wait is reported (and then every as long again).
+DRAIN_WARNING = 120.0
+
+
+def process_tree_rss():
+    """Current RSS (bytes) of this process and its descendants, or None where /proc is not available."""
+    if not os.path.isdir("/proc"):
+        return None
+    children, rss = {}, {}
+    page_size = os.sysconf("SC_PAGE_SIZE")
+    for entry in os.listdir("/proc"):
+        if not entry.isdigit():
+            continue
+        try:
+            with open(f"/proc/{entry}/stat") as f:
+                # The command name may contain spaces; the fields after it are fixed.
+                fields = f.read().rpartition(")")[2].split()
+            with open(f"/proc/{entry}/statm") as f:
+                rss[int(entry)] = int(f.read().split()[1]) * page_size
+        except (OSError, IndexError, ValueError):
+            continue
+        children.setdefault(int(fields[1]), []).append(int(entry))
+    total, pending = 0, [os.getpid()]
+    while pending:
+        pid = pending.pop()
+        total += rss.get(pid, 0)
+        pending.extend(children.get(pid, ()))
+    return total
+
+
+class ResourceGovernor:
+    """Pauses the crawl and recycles the browser contexts when memory passes the limit."""
+
+    def __init__(self, memory_limit_mb=0):
+        self.memory_limit = memory_limit_mb * 1024 * 1024
+        self.spider = None
+        self.checker = None
+        self.paused_at = None
+        self.warned_at = None
+        self.recycling = False
+
+    def open(self, spider):
+        self.spider = spider
+        if self.memory_limit and process_tree_rss() is None:
+            logger.warning("Current memory use can't be measured on this system (no /proc); "
+                           "--memory-limit-mb is disabled.")
+            self.memory_limit = 0
+        from twisted.internet import task
+
+        self.checker = task.LoopingCall(self.check)
+        self.checker.start(CHECK_INTERVAL, now=False)
+
+    def close(self):
+        if self.checker is not None and self.checker.running:
+            self.checker.stop()
+
+    def check(self):
+        engine = self.spider.crawler.engine
+        stats = self.spider.crawler.stats
+        rss = process_tree_rss()
+        if rss is not None:
+            stats.set_value("governor/rss_mb", round(rss / 1024 / 1024))
+            stats.max_value("governor/rss_mb_max", round(rss / 1024 / 1024))
+        stats.max_value("governor/open_pages_max", self.spider.browser_contexts.open_pages())
+        stats.max_value("governor/contexts_max", len(self.spider.browser_contexts.prepared_contexts))
+        if not self.memory_limit or self.recycling:
+            return
+
+        if self.paused_at is None:
+            if rss > self.memory_limit:
+                logger.warning(f"Memory use {rss / 1024 / 1024:.0f} MB is over the limit; "
+                               f"pausing the crawl to recycle the browser contexts.")
+                engine.pause()
+                self.paused_at = self.warned_at = time.monotonic()
+            return
+
+        # Closing a context under a page in flight would fail its request, so the drain is waited out.
+        if engine.downloader.active or self.spider.pages_in_flight:
+            if time.monotonic() - self.warned_at > DRAIN_WARNING:
+                logger.warning(f"Still waiting for {len(engine.downloader.active)} downloads and "
+                               f"{self.spider.pages_in_flight} pages to finish before recycling the browser contexts.")
+                self.warned_at = time.monotonic()
+            return
+        self.recycling = True
+        asyncio.ensure_future(self.recycle(engine, stats))
+
+    async def recycle(self, engine, stats):
+        try:
+            await self.spider.browser_contexts.recycle()
+            gc.collect()
+            stats.inc_value("governor/recycles")
+            logger.warning(f"Browser contexts recycled; memory use is now {process_tree_rss() / 1024 / 1024:.0f} MB.")
+        except Exception as e:
+            logger.error(f"Recycling the browser contexts failed: {e}")
+        finally:
+            self.paused_at = self.warned_at = None
+            self.recycling = False
+            engine.unpause()
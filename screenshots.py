@@ -0,0 +1,87 @@
+"""Screenshot encoding and perceptual hashes, run in the post-processing workers.
+
+The browser only returns PNG bytes; save_screenshot re-encodes them when
+asked (lossless WebP is typically much smaller than PNG), writes the file
+or artifact store blob, and returns a perceptual hash of the image. When
+the reference and test screenshots of a pair have the same hash and size,
+page_diff skips the pixel comparison.
+
+The hash is a 256-bit difference hash: the grayscale image is scaled to
+17x16 and every bit records whether a pixel is brighter than its right
+neighbour. It is stored with the image size, so equal hashes also mean
+equal dimensions.
+"""
+import io
+
+try:
+    import numpy as np
+    from PIL import Image
+except ImportError:  # screenshots are stored as PNG without hashes
+    np = None
+    Image = None
+
+from artifact_store import put_blob
+
+FORMATS = ("png", "webp")
+
+HASH_SIZE = 16
+
+# Part of the page captured: the whole page, the viewport, or the top <N> pixels.
+CLIP_CHOICES = ("full", "viewport", "<max height px>")
+
+
+def parse_clip(value):
+    """Validate a --screenshot-clip value; returns "full", "viewport" or a height in pixels."""
+    if value in ("full", "viewport"):
+        return value
+    if str(value).isdigit() and int(value) > 0:
+        return int(value)
+    raise ValueError(f"Unknown screenshot clip {value!r}; expected one of {', '.join(CLIP_CHOICES)}")
+
+
+def parse_viewport(value):
+    """'1280x800' -> {"width": 1280, "height": 800}; None for an empty value."""
+    if not value:
+        return None
+    width, _, height = value.lower().partition("x")
+    if not (width.isdigit() and height.isdigit()):
+        raise ValueError(f"Viewport {value!r} is not WIDTHxHEIGHT")
+    return {"width": int(width), "height": int(height)}
+
+
+def perceptual_hash(image):
+    """Hex difference hash of a PIL image."""
+    small = image.convert("L").resize((HASH_SIZE + 1, HASH_SIZE), Image.Resampling.LANCZOS)
+    pixels = np.asarray(small, dtype=np.int16)
+    bits = (pixels[:, 1:] > pixels[:, :-1]).flatten()
+    return np.packbits(bits).tobytes().hex()
+
+
+def hash_distance(first, second):
+    """Number of differing bits between two save_screenshot hashes (sizes aside)."""
+    return bin(int(first.partition(":")[2], 16) ^ int(second.partition(":")[2], 16)).count("1")
+
+
+def save_screenshot(png, image_format="png", path=None, store=None):
+    """Encode a PNG screenshot to image_format and write it to path (or the store at root store).
+
+    Returns {"hash": "<width>x<height>:<perceptual hash>"} (hash None without
+    Pillow) and, for the store, its index "entry".
+    """
+    result = {"hash": None}
+    data = png
+    if Image is not None:
+        with Image.open(io.BytesIO(png)) as image:
+            image.load()
+            result["hash"] = f"{image.width}x{image.height}:{perceptual_hash(image)}"
+            if image_format == "webp":
+                buffer = io.BytesIO()
+                image.save(buffer, "WEBP", lossless=True)
+                data = buffer.getvalue()
+    if store:
+        # Both formats are compressed already.
+        result["entry"] = put_blob(store, data, compress=False)
+    else:
+        with open(path, "wb") as f:
+            f.write(data)
+    return result
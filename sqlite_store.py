@@ -0,0 +1,63 @@
+"""SQLite files the spider writes from the event loop: the crawl state and the artifact store index.
+
+Writes are batched into few commits (BatchedCommits), and connections wait
+up to BUSY_TIMEOUT seconds for another process's write lock, since both
+files can be shared by --distributed workers.
+"""
+import sqlite3
+import time
+
+# Commit at least this often; batching keeps SQLite off the hot path.
+COMMIT_EVERY = 200
+COMMIT_INTERVAL = 2.0
+
+# How long a connection waits for another process's write lock.
+BUSY_TIMEOUT = 30
+
+
+def connect(path, shared=False):
+    """Open path in WAL mode, or with a rollback journal when it is shared between machines.
+
+    WAL needs shared memory between the processes using the file, so it only
+    works on a local disk. A file on shared storage (NFS, SMB) uses the
+    rollback journal and file locks instead: every connection to it must be
+    opened with shared set, and the filesystem must support POSIX locks.
+    """
+    connection = sqlite3.connect(path, timeout=BUSY_TIMEOUT)
+    if shared:
+        connection.execute("PRAGMA journal_mode=DELETE")
+        connection.execute("PRAGMA synchronous=FULL")
+    else:
+        connection.execute("PRAGMA journal_mode=WAL")
+        connection.execute("PRAGMA synchronous=NORMAL")
+    return connection
+
+
+class BatchedCommits:
+    """Commits the writes made on self.connection in batches; call _written() after every write.
+
+    A batch is committed after commit_every writes or COMMIT_INTERVAL seconds.
+    With schedule_commit set, the first write of a batch schedules its commit
+    instead (see CrawlState.join_run).
+    """
+
+    def __init__(self, connection, commit_every=COMMIT_EVERY):
+        self.connection = connection
+        self.commit_every = commit_every
+        self.schedule_commit = None
+        self._pending_writes = 0
+        self._last_commit = time.monotonic()
+
+    def commit(self):
+        self.connection.commit()
+        self._pending_writes = 0
+        self._last_commit = time.monotonic()
+
+    def _written(self):
+        self._pending_writes += 1
+        if self.schedule_commit is not None:
+            if self._pending_writes == 1:
+                self.schedule_commit(self.commit)
+            return
+        if self._pending_writes >= self.commit_every or time.monotonic() - self._last_commit >= COMMIT_INTERVAL:
+            self.commit()
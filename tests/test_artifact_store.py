@@ -0,0 +1,57 @@
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+from artifact_store import ArtifactStore, artifact_key, blob_path, put_blob, read_blob
+
+
+def stored_files(root):
+    return [name for _, _, names in os.walk(os.path.join(root, "blobs")) for name in names]
+
+
+def test_put_blob_stores_identical_content_once(tmp_path):
+    first = put_blob(str(tmp_path), b"<html>page</html>" * 100)
+    second = put_blob(str(tmp_path), b"<html>page</html>" * 100)
+    assert first == second
+    assert first["blob"].endswith(".z")
+    assert first["stored_size"] < first["size"] == 1700
+    assert read_blob(str(tmp_path), first["blob"]) == b"<html>page</html>" * 100
+    assert stored_files(str(tmp_path)) == [first["blob"]]
+
+
+def test_put_blob_uncompressed(tmp_path):
+    entry = put_blob(str(tmp_path), b"\x89PNG", compress=False)
+    assert not entry["blob"].endswith(".z")
+    with open(blob_path(str(tmp_path), entry["blob"]), "rb") as f:
+        assert f.read() == b"\x89PNG"
+
+
+def test_put_blob_from_threads(tmp_path):
+    data = os.urandom(200_000)
+    with ThreadPoolExecutor(8) as executor:
+        entries = list(executor.map(lambda _: put_blob(str(tmp_path), data), range(32)))
+    assert len({entry["blob"] for entry in entries}) == 1
+    assert stored_files(str(tmp_path)) == [entries[0]["blob"]]
+    assert read_blob(str(tmp_path), entries[0]["blob"]) == data
+
+
+def test_iter_pairs(tmp_path):
+    store = ArtifactStore(str(tmp_path))
+    for folder, url, text in (
+        ("reference", "http://ref/a?x=1", b"ref a"),
+        ("test", "http://test/a?x=1", b"test a"),
+        ("reference", "http://ref/only-reference", b"ref b"),
+        ("test", "http://test/b", b"same"),
+        ("reference", "http://ref/b", b"same"),
+    ):
+        store.add(folder, url, "text", put_blob(str(tmp_path), text))
+    store.add("test", "http://test/a?x=1", "html", put_blob(str(tmp_path), b"<p>"))
+    assert list(store.iter_pairs("text")) == [("/a?x=1", b"ref a", b"test a"), ("/b", b"same", b"same")]
+    assert store.read("test", "http://test/a?x=1", "html") == b"<p>"
+    assert store.read("reference", "http://ref/a?x=1", "html") is None
+    assert store.summary()["blobs"] == 5
+    store.close()
+
+
+def test_artifact_key():
+    assert artifact_key("http://example.com") == "/"
+    assert artifact_key("http://example.com/a/b?q=" + "x" * 300) == "/a/b?q=" + "x" * 300
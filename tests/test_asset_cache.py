@@ -0,0 +1,23 @@
+from asset_cache import cacheable, max_age
+
+
+def test_max_age():
+    assert max_age({"cache-control": "public, max-age=600"}, 3600) == 600
+    assert max_age({}, 3600) == 3600
+    assert max_age({"cache-control": "public"}, 3600) == 3600
+
+
+def test_max_age_revalidate_every_time():
+    assert max_age({"cache-control": "no-cache"}, 3600) == 0
+    assert max_age({"cache-control": "no-cache, max-age=600"}, 3600) == 0
+    assert max_age({"cache-control": "private"}, 3600) == 0
+    assert max_age({"cache-control": "must-revalidate"}, 3600) == 0
+    assert max_age({"cache-control": "private, max-age=60"}, 3600) == 60
+
+
+def test_cacheable():
+    assert cacheable({})
+    assert cacheable({"vary": "Accept-Encoding"})
+    assert not cacheable({"cache-control": "no-store"})
+    assert not cacheable({"vary": "Cookie"})
+    assert not cacheable({"vary": "accept-encoding, *"})
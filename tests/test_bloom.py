@@ -0,0 +1,23 @@
+from bloom import BloomFilter
+
+
+def test_no_false_negatives():
+    bloom = BloomFilter(1000, 0.01)
+    keys = [f"key-{n}" for n in range(1000)]
+    for key in keys:
+        bloom.add(key)
+    assert all(key in bloom for key in keys)
+
+
+def test_add_reports_possible_presence():
+    bloom = BloomFilter(100)
+    assert bloom.add("a") is False
+    assert bloom.add("a") is True
+
+
+def test_false_positive_rate_near_error_rate():
+    bloom = BloomFilter(10_000, 0.01)
+    for n in range(10_000):
+        bloom.add(f"in-{n}")
+    false_positives = sum(f"out-{n}" in bloom for n in range(10_000))
+    assert false_positives < 300
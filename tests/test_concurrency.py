@@ -0,0 +1,59 @@
+import csv
+
+import concurrency
+from concurrency import WINDOW, ConcurrencyController, SiteConcurrency
+
+
+def fill(site, ttfb=100.0, load=1000.0, errors=0):
+    for n in range(WINDOW):
+        site.samples.append((ttfb, load, n < errors))
+
+
+def test_decide_waits_for_a_full_window():
+    site = SiteConcurrency("reference", 4, 1, 8)
+    site.samples.append((100.0, 1000.0, False))
+    assert site.decide(0, 0.05) is None
+
+
+def test_decide_increases_with_headroom():
+    site = SiteConcurrency("reference", 4, 1, 8)
+    fill(site)
+    assert site.decide(2000, 0.05)[:2] == (5, "headroom")
+    assert not site.samples
+
+
+def test_decide_at_maximum_and_hold():
+    site = SiteConcurrency("reference", 8, 1, 8)
+    fill(site)
+    assert site.decide(0, 0.05)[:2] == (8, "at_maximum")
+    fill(site, load=1900.0)
+    assert site.decide(2000, 0.05)[:2] == (8, "hold")
+
+
+def test_decide_decreases():
+    site = SiteConcurrency("reference", 8, 1, 16)
+    fill(site, errors=2)
+    assert site.decide(0, 0.05)[:2] == (6, "errors")
+    fill(site, load=3000.0)
+    assert site.decide(2000, 0.05)[:2] == (6, "load_event")
+    # The best median TTFB so far is 100 ms; 400 ms means the server is queueing.
+    site.concurrency = 4
+    fill(site, ttfb=400.0)
+    assert site.decide(0, 0.05)[:2] == (3, "ttfb")
+    site.concurrency = 1
+    fill(site, errors=5)
+    assert site.decide(0, 0.05)[:2] == (1, "errors")
+
+
+def test_every_decision_is_logged(tmp_path, monkeypatch):
+    monkeypatch.setattr(concurrency, "DECISION_LOG_PATH", str(tmp_path / "concurrency.csv"))
+    controller = ConcurrencyController(["reference"], start=2, maximum=2)
+    controller.open(None, None)
+    for _ in range(2 * WINDOW):
+        controller.record("reference", ttfb=100.0, load_event=1000.0)
+    controller.close()
+    with open(tmp_path / "concurrency.csv", encoding="utf-8") as f:
+        rows = list(csv.DictReader(f))
+    assert [(row["old_concurrency"], row["new_concurrency"], row["reason"]) for row in rows] == [
+        ("2", "2", "at_maximum"), ("2", "2", "at_maximum"),
+    ]
@@ -0,0 +1,41 @@
+import json
+
+from console_errors import ErrorIndex, PageConsole, fingerprint, merge_indexes, normalize
+
+
+def test_normalize_origins_ids_and_numbers():
+    assert normalize("Failed at https://example.com/node/123 line 4") == "Failed at <origin>/node/N line N"
+    assert normalize("Missing 3f2a9c1b-77aa-4e0b in   cache") == "Missing <id> in cache"
+
+
+def test_normalize_hashed_assets_and_queries():
+    reference = normalize("at attach (https://a.example/files/js/js_AbCdEfGhIjKlMnOpQrSt0123-_x.js?scache=a1:12:34)")
+    test = normalize("at attach (http://b.test:8080/files/js/js_ZyXwVuTsRqPoNmLkJiHg9876-_y.js?scache=b2:12:40)")
+    assert reference == test == "at attach (<origin>/files/js/js_<hash>.js:N:N)"
+    assert normalize("Failed to load /core/misc/drupal.js?v=10.2.3") == "Failed to load /core/misc/drupal.js"
+    assert normalize("What? Really?") == "What? Really?"
+
+
+def test_fingerprint_is_shared_across_sites():
+    assert fingerprint("error", "boom", "https://a.example/js/app.js?v=1") == \
+        fingerprint("error", "boom", "http://b.test/js/app.js?v=2")
+    assert fingerprint("error", "boom") != fingerprint("warning", "boom")
+
+
+def test_merge_indexes_sums_counts_per_fingerprint(tmp_path):
+    console = PageConsole(10)
+    console.add("error", "boom 1")
+    console.add("error", "boom 2")
+    for suffix, site, path in (("-a", "reference", "/a"), ("-b", "test", "/b"), ("-c", "test", "/a")):
+        index = ErrorIndex(str(tmp_path), append=True, suffix=suffix)
+        index.add(site, path, console)
+        index.close()
+
+    merged = merge_indexes(str(tmp_path))
+    assert len(merged) == 1
+    entry = next(iter(merged.values()))
+    assert entry["reference"] == {"pages": 1, "occurrences": 2, "examples": ["/a"]}
+    assert entry["test"] == {"pages": 2, "occurrences": 4, "examples": ["/b", "/a"]}
+    # Merging leaves the per-process files alone.
+    with open(tmp_path / "errors-b.json", encoding="utf-8") as f:
+        assert next(iter(json.load(f).values()))["test"]["pages"] == 1
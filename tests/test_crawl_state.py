@@ -0,0 +1,71 @@
+import crawl_state
+from crawl_state import CrawlState
+
+
+def new_state(tmp_path):
+    state = CrawlState(str(tmp_path / "state.sqlite"))
+    state.begin_run()
+    return state
+
+
+def test_claim_takes_each_page_once(tmp_path):
+    state = new_state(tmp_path)
+    for n in range(3):
+        state.enqueue(1, f"/p{n}", f"http://a/p{n}", 1)
+    first = state.claim("w1", 2)
+    second = state.claim("w2", 2)
+    assert len(first) == 2 and len(second) == 1
+    assert {page["url"] for page in first + second} == {"http://a/p0", "http://a/p1", "http://a/p2"}
+    assert state.claim("w3", 2) == []
+    assert state.outstanding() == 3
+
+
+def test_claim_order(tmp_path):
+    state = new_state(tmp_path)
+    state.enqueue(1, "/deep", "http://a/deep", 3)
+    state.enqueue(1, "/ranked", "http://a/ranked", 1, sample_rank=2)
+    state.enqueue(1, "/shallow", "http://a/shallow", 1)
+    state.enqueue(2, "/test", "http://b/test", 5)
+    # The order decides which pages a claim takes (RETURNING itself is unordered).
+    assert [state.claim("w", 1)[0]["url"] for _ in range(4)] == [
+        "http://b/test", "http://a/shallow", "http://a/deep", "http://a/ranked",
+    ]
+
+
+def test_claim_by_phase(tmp_path):
+    state = new_state(tmp_path)
+    state.enqueue(1, "/a", "http://a/a", 0)
+    state.enqueue(2, "/a", "http://b/a", 0)
+    assert [page["phase"] for page in state.claim("w", 10, phase=1)] == [1]
+
+
+def test_expired_claims_are_taken_over(tmp_path, monkeypatch):
+    state = new_state(tmp_path)
+    state.enqueue(1, "/a", "http://a/a", 0)
+    assert len(state.claim("w1", 1)) == 1
+    assert state.claim("w2", 1) == []
+    monkeypatch.setattr(crawl_state, "CLAIM_LEASE", -1)
+    assert [page["url"] for page in state.claim("w2", 1)] == ["http://a/a"]
+
+
+def test_done_pages_are_not_claimed(tmp_path):
+    state = new_state(tmp_path)
+    state.enqueue(1, "/a", "http://a/a", 0)
+    state.mark_done(1, "/a", "http://a/a", 0)
+    assert state.claim("w", 1) == []
+    assert state.is_seen(1, "/a")
+    assert not state.is_seen(1, "/b")
+
+
+def test_shared_state_uses_a_rollback_journal(tmp_path):
+    path = str(tmp_path / "state.sqlite")
+    first = CrawlState(path, shared=True)
+    first.begin_run()
+    second = CrawlState(path, shared=True)
+    second.join_run(first.run_id)
+    assert first.connection.execute("PRAGMA journal_mode").fetchone()[0] == "delete"
+    first.enqueue(1, "/a", "http://a/a", 0)
+    first.enqueue(1, "/b", "http://a/b", 0)
+    first.commit()
+    claimed = [page["url"] for page in first.claim("w1", 1) + second.claim("w2", 5)]
+    assert sorted(claimed) == ["http://a/a", "http://a/b"]
@@ -0,0 +1,70 @@
+from bs4 import BeautifulSoup
+from scrapy.http import HtmlResponse, Request
+
+from fetch_strategy import SAMPLES_PER_PATTERN, FetchStrategy, requires_browser, signatures_differ
+from test import DualDomainSpider
+from url_templates import UrlTemplates
+
+TEXT = "<p>" + "Plenty of server-rendered text. " * 10 + "</p>"
+
+
+def tree(body):
+    return BeautifulSoup(f"<html><body>{body}</body></html>", "lxml")
+
+
+def test_requires_browser():
+    assert requires_browser(tree('<div id="root"></div>' + TEXT)) == "app_root"
+    assert requires_browser(tree('<div id="root"><p>Home</p></div>' + TEXT)) is None
+    assert requires_browser(tree("<noscript>Please enable JavaScript.</noscript>" + TEXT)) == "noscript"
+    assert requires_browser(tree("<noscript><img src='/pixel.gif'></noscript>" + TEXT)) is None
+    assert requires_browser(tree("<script src='/app.js'></script><p>Loading</p>")) == "no_text"
+    assert requires_browser(tree("<p>Short page without scripts</p>")) is None
+    assert requires_browser(tree('<div class="js-view-dom-id-1"></div>' + TEXT), ["div.js-view-dom-id-1"]) == "selector"
+
+
+def test_signatures_differ():
+    static = {"links": ["/a", "/b"], "text_length": 1000}
+    assert not signatures_differ(static, {"links": ["/a", "/b"], "text_length": 1090})
+    assert signatures_differ(static, {"links": ["/a", "/b"], "text_length": 1200})
+    assert signatures_differ(static, {"links": ["/a", "/b", "/c"], "text_length": 1000})
+    assert not signatures_differ({"links": [], "text_length": 0}, {"links": [], "text_length": 0})
+
+
+def test_patterns_are_the_shared_url_templates():
+    templates = UrlTemplates(learn_after=1)
+    strategy = FetchStrategy(templates)
+    assert strategy.render_reason("http://a/node/12", None) == "sampling"
+    assert strategy.render_reason("http://a/search?q=x", None) == "sampling"
+    templates.template("http://a/blog/first-post")
+    templates.template("http://a/blog/second-post")
+    assert strategy.render_reason("http://a/blog/third-post", None) == "sampling"
+    assert strategy.samples == {"/node/{id}": 1, "/search?q=": 1, "/blog/{slug}": 1}
+
+
+def test_render_reason_samples_each_pattern():
+    strategy = FetchStrategy(UrlTemplates())
+    reasons = [strategy.render_reason(f"http://a/node/{n}", None) for n in range(SAMPLES_PER_PATTERN + 1)]
+    assert reasons == ["sampling"] * SAMPLES_PER_PATTERN + [None]
+    assert strategy.render_reason("http://a/node/99", "app_root") == "app_root"
+    assert not strategy.learn("http://a/node/1", {"links": [], "text_length": 10}, {"links": [], "text_length": 10})
+    assert strategy.learn("http://a/node/2", {"links": [], "text_length": 10}, {"links": ["/x"], "text_length": 10})
+    assert strategy.render_reason("http://a/node/100", None) == "pattern_differs"
+
+
+def static_response(url, **meta):
+    return HtmlResponse(url, body=b"<html></html>", request=Request(url, meta=meta))
+
+
+def test_pairs_share_their_fetch_mode(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    spider = DualDomainSpider(crawl_depth=1, reference="http://ref/", test="http://test/", fetch="hybrid",
+                              state_path=str(tmp_path / "state.sqlite"))
+    # Lockstep pair: the half parsed first decides for both, whatever the other's static HTML says.
+    spider.pairs_in_flight["/a"] = {"remaining": {1, 2}, "rendered": set(), "test_url": "http://test/a"}
+    assert spider.pair_render_reason(static_response("http://test/a", phase=2, pair="/a"), "app_root") == "app_root"
+    assert spider.pair_render_reason(static_response("http://ref/a", phase=1, pair="/a"), None) == "app_root"
+    # A test page scheduled after its reference was fetched statically stays static.
+    assert spider.pair_render_reason(static_response("http://test/b", phase=2, browser=False), "app_root") is None
+    # Neither counted as a sample of the pattern.
+    assert spider.fetch_strategy.samples == {}
+    spider.state.close()
@@ -0,0 +1,89 @@
+import asyncio
+from types import SimpleNamespace
+
+import pytest
+from scrapy.http import HtmlResponse, Request
+from scrapy.settings import Settings
+from scrapy.statscollectors import StatsCollector
+
+from test import DualDomainSpider
+
+SERVED = b"<html><body><div id='app'></div><script src='/app.js'></script></body></html>"
+RENDERED = b"<html><body><div id='app'><p>Rendered</p></div><script src='/app.js'></script></body></html>"
+
+
+class FakeResponse:
+    def __init__(self, frame, url, body, navigation=True):
+        self.frame, self.url, self._body = frame, url, body
+        self.request = SimpleNamespace(is_navigation_request=lambda: navigation)
+
+    async def body(self):
+        return self._body
+
+
+class FakePage:
+    def __init__(self):
+        self.main_frame = object()
+        self.handlers = {}
+
+    def on(self, event, handler):
+        self.handlers.setdefault(event, []).append(handler)
+
+    def emit(self, event, value):
+        for handler in self.handlers.get(event, []):
+            handler(value)
+
+
+def spider(tmp_path, **kwargs):
+    crawler = SimpleNamespace(stats=StatsCollector(SimpleNamespace(settings=Settings())))
+    spider = DualDomainSpider(crawl_depth=0, reference="", test="http://test/",
+                              state_path=str(tmp_path / "state.sqlite"), **kwargs)
+    spider.crawler = crawler
+    return spider
+
+
+@pytest.fixture(autouse=True)
+def output_dir(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+
+
+def test_rendered_pages_store_the_hash_of_the_served_document(tmp_path):
+    full = spider(tmp_path)
+    page = FakePage()
+    full.browser_contexts.track_documents(page)
+    page.emit("response", FakeResponse(page.main_frame, "http://test/a", SERVED))
+    page.emit("response", FakeResponse(page.main_frame, "http://test/app.js", b"render()", navigation=False))
+    page.emit("response", FakeResponse(object(), "http://test/frame", b"<html>frame</html>"))
+    rendered = HtmlResponse("http://test/a", body=RENDERED, request=Request(
+        "http://test/a", meta={"phase": 2, "depth": 0, "playwright_page": page}))
+    document_hash = asyncio.run(full.document_hash(rendered))
+    full.state.mark_done(2, "/a", "http://test/a", 0, content_hash=document_hash)
+    full.state.finish_run()
+    full.state.close()
+
+    # The next incremental run probes the page over plain HTTP and gets the served HTML again.
+    incremental = spider(tmp_path, incremental="true")
+    probe = HtmlResponse("http://test/a", body=SERVED, request=Request(
+        "http://test/a", meta={"phase": 2, "depth": 0}))
+    assert list(incremental.parse_probe(probe)) == []
+    assert incremental.crawler.stats.get_value("incremental/unchanged_pages") == 1
+    incremental.state.close()
+
+
+def test_without_the_served_document_the_probe_stores_the_hash(tmp_path):
+    full = spider(tmp_path)
+    page = FakePage()
+    full.browser_contexts.track_documents(page)
+    rendered = HtmlResponse("http://test/a", body=RENDERED, request=Request(
+        "http://test/a", meta={"phase": 2, "depth": 0, "playwright_page": page}))
+    assert asyncio.run(full.document_hash(rendered)) is None
+    full.state.mark_done(2, "/a", "http://test/a", 0, content_hash=None)
+    full.state.finish_run()
+    full.state.close()
+
+    incremental = spider(tmp_path, incremental="true")
+    probe = HtmlResponse("http://test/a", body=SERVED, request=Request(
+        "http://test/a", meta={"phase": 2, "depth": 0}))
+    [render] = incremental.parse_probe(probe)
+    assert render.meta["render"] and render.meta["probe"]["content_hash"]
+    incremental.state.close()
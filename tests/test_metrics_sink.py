@@ -0,0 +1,60 @@
+import json
+
+import metrics_sink
+from metrics_sink import MetricsSink, write_summary
+
+
+def record(phase, path, load_event, ttfb=100.0):
+    return {"phase": phase, "url": f"http://{phase}{path}", "path": path, "url_pattern": "/node/{id}",
+            "ttfb": ttfb, "load_event": load_event}
+
+
+def write_records(metrics_dir, records):
+    sink = MetricsSink(str(metrics_dir))
+    for item in records:
+        sink.add(item)
+    sink.close()
+
+
+def test_write_summary(tmp_path):
+    write_records(tmp_path, [
+        record("reference", "/node/1", 1000.0),
+        record("test", "/node/1", 1500.0),
+        record("reference", "/node/2", 1000.0),
+        record("test", "/node/2", 1010.0),
+    ])
+    markdown_path = write_summary(str(tmp_path), threshold=0.2)
+
+    with open(tmp_path / "summary.json", encoding="utf-8") as f:
+        summary = json.load(f)
+    assert summary["phases"]["test"]["pages"] == 2
+    assert summary["phases"]["test"]["load_event"]["p50"] == 1255.0
+    assert [pair["path"] for pair in summary["regressions"]] == ["/node/1"]
+    assert summary["regressions"][0]["regressions"] == ["load_event"]
+    with open(markdown_path, encoding="utf-8") as f:
+        assert "## Regressions (1 of 2 pairs, threshold 20%)" in f.read()
+
+
+def test_pairs_fetched_differently_are_not_compared(tmp_path):
+    write_records(tmp_path, [
+        {**record("reference", "/node/1", None, ttfb=40.0), "fetch": "http"},
+        {**record("test", "/node/1", 1500.0, ttfb=400.0), "fetch": "browser"},
+    ])
+    write_summary(str(tmp_path))
+    with open(tmp_path / "summary.json", encoding="utf-8") as f:
+        summary = json.load(f)
+    assert summary["pairs"] == [] and summary["regressions"] == []
+
+
+def test_latest_record_per_page_wins(tmp_path):
+    write_records(tmp_path, [record("test", "/node/1", 1000.0), record("test", "/node/1", 2000.0)])
+    write_summary(str(tmp_path))
+    with open(tmp_path / "summary.json", encoding="utf-8") as f:
+        assert json.load(f)["phases"]["test"]["load_event"]["p50"] == 2000.0
+
+
+def test_percentiles_without_numpy(monkeypatch):
+    values = [1.0, 2.0, 3.0, 4.0, 10.0]
+    with_numpy = metrics_sink.percentiles(values, metrics_sink.PERCENTILES)
+    monkeypatch.setattr(metrics_sink, "np", None)
+    assert metrics_sink.percentiles(values, metrics_sink.PERCENTILES) == with_numpy
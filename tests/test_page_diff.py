@@ -0,0 +1,85 @@
+import io
+import json
+
+import pytest
+
+from artifact_store import put_blob
+from page_diff import DiffReport, compare_pair, diff_screenshots, diff_text
+from postprocess import get_output_filepath, write_file
+
+np = pytest.importorskip("numpy")
+Image = pytest.importorskip("PIL.Image")
+
+
+def png(width, height, color=(255, 255, 255)):
+    buffer = io.BytesIO()
+    Image.new("RGB", (width, height), color).save(buffer, "PNG")
+    return buffer.getvalue()
+
+
+def test_diff_screenshots_same_size(tmp_path):
+    result = diff_screenshots(png(4, 4), png(4, 4), str(tmp_path / "diff.png"))
+    assert result["changed"] is False and result["changed_pixels"] == 0
+    assert "diff_image" not in result
+
+
+def test_diff_screenshots_pads_to_the_larger_canvas(tmp_path):
+    # Extra height on the test side is changed even where the page is white (like the padding would be).
+    result = diff_screenshots(png(4, 4), png(4, 6), str(tmp_path / "diff.png"))
+    assert result["changed_pixels"] == 8
+    assert result["changed_ratio"] == round(8 / 24, 6)
+    assert result["size_reference"] == [4, 4] and result["size_test"] == [4, 6]
+    with Image.open(result["diff_image"]) as image:
+        assert image.size == (4, 6)
+    # Either side can be the larger one.
+    assert diff_screenshots(png(5, 4), png(4, 4), str(tmp_path / "diff2.png"))["changed_pixels"] == 4
+
+
+def test_diff_screenshots_threshold(tmp_path):
+    assert not diff_screenshots(png(2, 2, (100, 100, 100)), png(2, 2, (108, 100, 100)), str(tmp_path / "d.png"))["changed"]
+    assert diff_screenshots(png(2, 2, (100, 100, 100)), png(2, 2, (109, 100, 100)), str(tmp_path / "d.png"))["changed"]
+
+
+def test_compare_pair_from_output_files(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    url = "http://test/a"
+    write_file(get_output_filepath("reference", url, "text", ".md"), "# Title\nold\n")
+    write_file(get_output_filepath("test", url, "text", ".md"), "# Title\nnew\n")
+    write_file(get_output_filepath("reference", url, "screenshots", ".png"), png(4, 4), binary=True)
+    write_file(get_output_filepath("test", url, "screenshots", ".png"), png(4, 4, (0, 0, 0)), binary=True)
+    result = compare_pair(url, screenshot_ext=".png")
+    assert (result["text"]["added"], result["text"]["removed"]) == (1, 1)
+    assert result["screenshot"]["changed_pixels"] == 16
+
+
+def test_compare_pair_from_the_store_skips_equal_hashes(tmp_path):
+    store = str(tmp_path)
+    blobs = {
+        folder: {"text": put_blob(store, b"same\n")["blob"], "screenshot": put_blob(store, png(4, 4))["blob"]}
+        for folder in ("reference", "test")
+    }
+    hashes = {"reference": "4x4:ff00", "test": "4x4:ff00"}
+    result = compare_pair("http://test/a", ".png", store=store, blobs=blobs, screenshot_hashes=hashes)
+    assert result["text"]["changed"] is False
+    assert result["screenshot"] == {"changed": False, "skipped": "hash"}
+    # A missing artifact is reported, not raised.
+    assert compare_pair("http://test/a", store=store, blobs={"reference": blobs["reference"]})["text"] == {
+        "error": "missing text file"
+    }
+
+
+def test_report_keeps_the_latest_result_per_url(tmp_path):
+    changed, same = diff_text(b"old\n", b"new\n"), diff_text(b"same\n", b"same\n")
+    report = DiffReport(str(tmp_path))
+    report.add({"url": "http://test/a", "text": changed})
+    report.add({"url": "http://test/b", "text": same})
+    report.close()
+    # An incremental run appends only the pairs it compared again.
+    report = DiffReport(str(tmp_path), append=True)
+    report.add({"url": "http://test/a", "text": same})
+    report.close()
+    assert {result["url"]: result["text"]["changed"] for result in report.results()} == {
+        "http://test/a": False, "http://test/b": False,
+    }
+    with open(tmp_path / "diff.jsonl", encoding="utf-8") as f:
+        assert len([json.loads(line) for line in f]) == 3
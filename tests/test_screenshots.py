@@ -0,0 +1,25 @@
+import pytest
+
+from screenshots import hash_distance, parse_clip, parse_viewport
+
+
+def test_parse_clip():
+    assert parse_clip("full") == "full"
+    assert parse_clip("viewport") == "viewport"
+    assert parse_clip("900") == 900
+    for value in ("0", "-5", "page", ""):
+        with pytest.raises(ValueError):
+            parse_clip(value)
+
+
+def test_parse_viewport():
+    assert parse_viewport("1280x800") == {"width": 1280, "height": 800}
+    assert parse_viewport("") is None
+    with pytest.raises(ValueError):
+        parse_viewport("1280")
+
+
+def test_hash_distance_ignores_sizes():
+    assert hash_distance("1280x720:ff00", "1280x900:ff00") == 0
+    assert hash_distance("1280x720:ff00", "1280x720:ff01") == 1
+    assert hash_distance("1280x720:0000", "1280x720:ffff") == 16
@@ -0,0 +1,43 @@
+from bs4 import BeautifulSoup
+
+from text_extraction import MarkdownConverter, html_to_markdown
+
+
+def convert(html, width=72):
+    return MarkdownConverter(width).convert(BeautifulSoup(html, "html.parser"))
+
+
+def test_lists():
+    assert html_to_markdown(
+        "<ul><li>One</li><li>Two<ul><li>Nested</li></ul></li></ul><ol><li>First</li><li>Second</li></ol>"
+    ) == "-   One\n-   Two\n    -   Nested\n\n1.  First\n2.  Second\n"
+    # Items with paragraphs make the list loose.
+    assert html_to_markdown("<ul><li><p>One</p><p>more</p></li><li><p>Two</p></li></ul>") == (
+        "-   One\n\n    more\n\n-   Two\n"
+    )
+
+
+def test_tables():
+    assert html_to_markdown(
+        "<table><tr><th>Name</th><th>Value</th></tr><tr><td>a|b</td><td>1<br>2</td></tr><tr><td>only</td></tr></table>"
+    ) == "| Name | Value |\n|---|---|\n| a\\|b | 1 2 |\n| only |  |\n"
+
+
+def test_escaping():
+    assert html_to_markdown("<p>Use *stars*, _under_ and [brackets] with <code>a*b</code></p>") == (
+        "Use \\*stars\\*, \\_under\\_ and \\[brackets\\] with `a*b`\n"
+    )
+    assert html_to_markdown("<p>- not a list</p><p>1. not ordered</p><p># not a heading</p><p>&gt; quote</p>") == (
+        "\\- not a list\n\n1\\. not ordered\n\n\\# not a heading\n\n\\> quote\n"
+    )
+
+
+def test_hard_breaks_and_wrapping():
+    assert html_to_markdown("<p>Line one<br>Line two<br></p><h2>Head<br>ing</h2>") == "Line one\\\nLine two\n\n## Head ing\n"
+    assert convert("<p>" + "word " * 6 + "</p>", width=15) == "word word word\nword word word\n"
+
+
+def test_inline_markup():
+    assert convert("<p>Some <strong> bold </strong>and <em>em</em> <a href='/x'>link</a></p>") == (
+        "Some **bold** and *em* [link](/x)\n"
+    )
@@ -0,0 +1,53 @@
+from crawl_state import CrawlState
+from test import DualDomainSpider
+from url_templates import TemplateSampler, UrlTemplates
+
+
+def test_template_replaces_ids_and_query_values():
+    templates = UrlTemplates()
+    assert templates.template("http://example.com/node/123") == "/node/{id}"
+    assert templates.template("http://example.com/search?q=x&page=4") == "/search?page=&q="
+    assert templates.template("http://example.com/") == "/"
+
+
+def test_template_learns_slugs_per_parent():
+    templates = UrlTemplates(learn_after=2)
+    assert templates.template("/blog/first-post") == "/blog/first-post"
+    assert templates.template("/blog/second-post") == "/blog/second-post"
+    assert templates.template("/blog/third-post") == "/blog/{slug}"
+    assert templates.template("/blog/first-post") == "/blog/{slug}"
+    assert templates.template("/about-us") == "/about-us"
+
+
+def test_sampler_admits_per_template_and_ranks(tmp_path):
+    state = CrawlState(str(tmp_path / "state.sqlite"))
+    state.begin_run()
+    sampler = TemplateSampler(2, state)
+    assert sampler.admit("/node/1") == 0
+    assert sampler.admit("/node/2") == 1
+    assert sampler.admit("/node/3") is None
+    assert sampler.admit("/about") == 0
+    # A page keeps its first decision.
+    assert sampler.admit("/node/2") == 1
+    assert sampler.admit("/node/3") is None
+    assert sorted(state.sample_coverage()) == [("/about", 1, 1), ("/node/{id}", 3, 2)]
+
+
+def test_sampler_counts_are_shared_through_the_state(tmp_path):
+    path = str(tmp_path / "state.sqlite")
+    first = CrawlState(path)
+    first.begin_run()
+    second = CrawlState(path)
+    second.join_run(first.run_id)
+    assert TemplateSampler(1, first).admit("/node/1") == 0
+    first.commit()
+    assert TemplateSampler(1, second).admit("/node/2") is None
+    assert TemplateSampler(1, second).admit("/node/1") == 0
+
+
+def test_spider_groups_pages_by_one_set_of_templates(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    spider = DualDomainSpider(crawl_depth=1, reference="", test="http://test/", fetch="hybrid", sample_per_template=2,
+                              state_path=str(tmp_path / "state.sqlite"))
+    assert spider.url_sampler.templates is spider.fetch_strategy.templates is spider.url_templates
+    spider.state.close()
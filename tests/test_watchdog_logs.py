@@ -0,0 +1,83 @@
+import asyncio
+
+import watchdog_logs
+from watchdog_logs import PER_PAGE_QUERY, WATERMARK_QUERY, WINDOW_QUERY, WatchdogClient, location_path
+
+
+def row(wid, location, message="Broken"):
+    return {"wid": wid, "timestamp": 1700000000 + wid, "type": "php", "message": message,
+            "variables": None, "severity": 3, "location": location}
+
+
+class FakeDatabase:
+    def __init__(self, rows):
+        self.rows = rows
+        self.queries = []
+
+    def query(self, sql, params=None):
+        self.queries.append((sql, params))
+        if sql == WATERMARK_QUERY:
+            return [{"wid": 0}]
+        if sql == WINDOW_QUERY:
+            return [r for r in self.rows if r["wid"] > params[0]]
+        return [r for r in self.rows if params[0].strip("%") in r["location"]]
+
+
+def client(mode, rows):
+    watchdog = WatchdogClient({}, mode=mode)
+    database = FakeDatabase(rows)
+    watchdog._query = database.query
+    return watchdog, database
+
+
+def test_location_path():
+    assert location_path("https://example.com/node/1?page=2") == "/node/1"
+    assert location_path("") == "/"
+    assert location_path(None) == "/"
+
+
+def test_bulk_mode_matches_exact_paths(monkeypatch):
+    monkeypatch.setattr(watchdog_logs, "REFRESH_INTERVAL", 0)
+    rows = [row(1, "http://a/node/1?x=1", "one"), row(2, "http://a/node/12", "twelve"), row(3, "http://a/node/1", "again")]
+    watchdog, database = client("bulk", rows)
+
+    async def lookups():
+        watchdog.start()
+        # The first lookup starts the background refresh and answers from what is loaded (nothing yet).
+        first = await watchdog.errors_for("http://a/node/1")
+        await watchdog._refresh_task
+        return first, await watchdog.errors_for("http://a/node/1"), await watchdog.errors_for("http://a/node/2")
+
+    first, node_1, node_2 = asyncio.run(lookups())
+    watchdog.close()
+    assert first == "No errors"
+    assert node_1 == "1700000003 [php]: again | 1700000001 [php]: one"
+    assert node_2 == "No errors"
+    assert [sql for sql, _ in database.queries].count(WINDOW_QUERY) <= 2
+
+
+def test_bulk_mode_refreshes_at_most_once_per_interval():
+    watchdog, database = client("bulk", [row(1, "http://a/")])
+
+    async def lookups():
+        watchdog.start()
+        results = []
+        for _ in range(30):
+            results.append(await watchdog.errors_for("http://a/"))
+            await asyncio.sleep(0.01)
+        watchdog._refresh_task.cancel()
+        return results
+
+    results = asyncio.run(lookups())
+    watchdog.close()
+    # The second refresh waits for REFRESH_INTERVAL (1 s); the lookups meanwhile use the first one's rows.
+    assert [sql for sql, _ in database.queries].count(WINDOW_QUERY) == 1
+    assert results[-1] == "1700000001 [php]: Broken"
+
+
+def test_per_page_mode_matches_the_path_anywhere():
+    watchdog, database = client("per-page", [row(1, "http://a/node/1"), row(2, "http://a/node/12")])
+    result = asyncio.run(watchdog.errors_for("http://a/node/1"))
+    watchdog.close()
+    assert database.queries == [(PER_PAGE_QUERY, ("%/node/1%",))]
+    assert result.count("[php]") == 2
@@ -0,0 +1,260 @@
+"""HTML-to-Markdown backends used for the output/text files.
+
+"native" walks an already parsed BeautifulSoup tree in-process and emits
+Markdown shaped like pandoc's output (ATX headings, 72 column wrapping,
+"-   " bullets, indented code blocks). "pandoc" keeps the original
+pypandoc conversion and is used as a fallback when the native converter
+fails on a page.
+"""
+import logging
+import re
+import textwrap
+
+from bs4 import BeautifulSoup
+from bs4.element import Comment, Declaration, Doctype, NavigableString, ProcessingInstruction, Tag
+
+try:
+    import pypandoc
+except ImportError:  # pandoc is optional when only the native backend is used
+    pypandoc = None
+
+logger = logging.getLogger(__name__)
+
+BACKENDS = ("native", "pandoc")
+
+LINE_WIDTH = 72
+
+SKIPPED_NODES = (Comment, Declaration, Doctype, ProcessingInstruction)
+
+SKIPPED_TAGS = {"head", "script", "style", "img", "svg", "noscript", "template", "iframe", "object", "canvas"}
+
+HEADING_TAGS = {"h1": 1, "h2": 2, "h3": 3, "h4": 4, "h5": 5, "h6": 6}
+
+BLOCK_TAGS = {
+    "address", "article", "aside", "blockquote", "body", "dd", "details", "dialog", "div", "dl", "dt",
+    "fieldset", "figcaption", "figure", "footer", "form", "h1", "h2", "h3", "h4", "h5", "h6", "header",
+    "hgroup", "hr", "html", "li", "main", "menu", "nav", "ol", "p", "pre", "section", "summary", "table",
+    "tbody", "td", "tfoot", "th", "thead", "tr", "ul",
+}
+
+STRONG_TAGS = {"strong", "b"}
+EMPHASIS_TAGS = {"em", "i", "cite", "dfn"}
+CODE_TAGS = {"code", "kbd", "samp", "tt"}
+
+ESCAPE_RE = re.compile(r'([\\`*_\[\]<>])')
+LINE_START_ESCAPE_RE = re.compile(r'^(\s*)(?:([#>+-])|(\d+)\.)(\s)', re.MULTILINE)
+WHITESPACE_RE = re.compile(r'\s+')
+
+# Placeholder for hard line breaks so they survive whitespace collapsing.
+HARD_BREAK = "\x00"
+
+
+def escape_line_start(match):
+    """Escape a line start that would read as a heading, quote or list marker (an ordered one as 1\\.)."""
+    indent, marker, number, space = match.groups()
+    return f"{indent}\\{marker}{space}" if marker else f"{indent}{number}\\.{space}"
+
+
+def clean_soup(soup):
+    """Strip scripts, styles, images, <div> wrappers and every attribute, in place."""
+    for tag in soup.find_all(['script', 'style', 'img']):
+        tag.decompose()
+    # Unwrap all <div> elements (in case of nested wrappers)
+    for tag in soup.find_all('div'):
+        tag.unwrap()
+    for tag in soup.find_all():
+        tag.attrs = {}
+    return soup
+
+
+def clean_html(html):
+    return str(clean_soup(BeautifulSoup(html, "html.parser")))
+
+
+def pandoc_to_markdown(cleaned_html):
+    if pypandoc is None:
+        raise RuntimeError("pypandoc is not installed")
+    markdown_text = pypandoc.convert_text(cleaned_html, 'md', format='html')
+    return re.sub(r'</?div>', '', markdown_text)
+
+
+def soup_to_markdown(soup):
+    """Convert a cleaned soup to Markdown without leaving the process."""
+    return MarkdownConverter().convert(soup)
+
+
+def html_to_markdown(html, backend="native"):
+    """Clean the HTML and convert it with the selected backend."""
+    soup = clean_soup(BeautifulSoup(html, "html.parser"))
+    return soup_to_markdown_with_backend(soup, backend)
+
+
+def soup_to_markdown_with_backend(soup, backend="native"):
+    """Convert a cleaned soup, falling back to pandoc if the native converter fails."""
+    if backend == "pandoc":
+        return pandoc_to_markdown(str(soup))
+    try:
+        return soup_to_markdown(soup)
+    except Exception as e:
+        if pypandoc is None:
+            raise
+        logger.warning(f"Native Markdown conversion failed, falling back to pandoc: {e}")
+        return pandoc_to_markdown(str(soup))
+
+
+class MarkdownConverter:
+    """Block/inline walker over a BeautifulSoup tree."""
+
+    def __init__(self, width=LINE_WIDTH):
+        self.width = width
+
+    def convert(self, soup):
+        root = soup.body or soup
+        blocks = self.blocks(root)
+        return "\n\n".join(blocks) + "\n" if blocks else ""
+
+    # Blocks
+
+    def blocks(self, node):
+        """Return the rendered Markdown blocks for the children of node."""
+        blocks = []
+        inline = []
+        for child in node.children:
+            if isinstance(child, Tag) and child.name in BLOCK_TAGS:
+                self.flush_paragraph(inline, blocks)
+                blocks.extend(self.block(child))
+            else:
+                inline.append(self.inline(child))
+        self.flush_paragraph(inline, blocks)
+        return blocks
+
+    def flush_paragraph(self, inline, blocks):
+        paragraph = self.wrap("".join(inline))
+        if paragraph:
+            blocks.append(paragraph)
+        inline.clear()
+
+    def block(self, tag):
+        name = tag.name
+        if name in HEADING_TAGS:
+            text = self.collapse(self.inline_children(tag)).replace(HARD_BREAK, " ").strip()
+            return ["#" * HEADING_TAGS[name] + " " + text] if text else []
+        if name == "p":
+            paragraph = self.wrap(self.inline_children(tag))
+            return [paragraph] if paragraph else []
+        if name in ("ul", "ol", "menu"):
+            return self.list_block(tag, ordered=name == "ol")
+        if name == "blockquote":
+            inner = "\n\n".join(self.blocks(tag))
+            return ["\n".join("> " + line if line else ">" for line in inner.splitlines())] if inner else []
+        if name == "pre":
+            code = tag.get_text().strip("\n")
+            return [textwrap.indent(code, "    ", lambda line: True)] if code.strip() else []
+        if name == "hr":
+            return ["-" * self.width]
+        if name == "table":
+            return self.table_block(tag)
+        if name == "dl":
+            return self.definition_list(tag)
+        return self.blocks(tag)
+
+    def list_block(self, tag, ordered):
+        items = []
+        loose = False
+        number = 1
+        for li in tag.find_all("li", recursive=False):
+            marker = f"{number}." if ordered else "-"
+            number += 1
+            marker = marker.ljust(4) if len(marker) < 4 else marker + " "
+            item_blocks = self.blocks(li)
+            if li.find("p", recursive=False) is not None and len(item_blocks) > 1:
+                loose = True
+            body = "\n\n".join(item_blocks) if loose else "\n".join(item_blocks)
+            lines = body.splitlines() or [""]
+            rendered = [marker + lines[0]] + [("    " + line) if line else "" for line in lines[1:]]
+            items.append("\n".join(rendered).rstrip())
+        if not items:
+            return []
+        return ["\n\n".join(items) if loose else "\n".join(items)]
+
+    def table_block(self, tag):
+        rows = []
+        for tr in tag.find_all("tr"):
+            cells = [
+                self.collapse(self.inline_children(cell)).replace(HARD_BREAK, " ").strip().replace("|", "\\|")
+                for cell in tr.find_all(["td", "th"], recursive=False)
+            ]
+            if cells:
+                rows.append(cells)
+        if not rows:
+            return []
+        columns = max(len(row) for row in rows)
+        rows = [row + [""] * (columns - len(row)) for row in rows]
+        lines = ["| " + " | ".join(rows[0]) + " |", "|" + "|".join(["---"] * columns) + "|"]
+        lines.extend("| " + " | ".join(row) + " |" for row in rows[1:])
+        return ["\n".join(lines)]
+
+    def definition_list(self, tag):
+        lines = []
+        for child in tag.find_all(["dt", "dd"], recursive=False):
+            text = self.collapse(self.inline_children(child)).replace(HARD_BREAK, " ").strip()
+            if not text:
+                continue
+            lines.append(text if child.name == "dt" else ":   " + text)
+        return ["\n".join(lines)] if lines else []
+
+    # Inline
+
+    def inline(self, node):
+        if isinstance(node, SKIPPED_NODES):
+            return ""
+        if isinstance(node, NavigableString):
+            return ESCAPE_RE.sub(r'\\\1', str(node))
+        if not isinstance(node, Tag) or node.name in SKIPPED_TAGS:
+            return ""
+        name = node.name
+        if name == "br":
+            return HARD_BREAK
+        if name in STRONG_TAGS:
+            return self.delimit(self.inline_children(node), "**")
+        if name in EMPHASIS_TAGS:
+            return self.delimit(self.inline_children(node), "*")
+        if name in CODE_TAGS:
+            return self.delimit(WHITESPACE_RE.sub(" ", node.get_text()), "`")
+        if name == "a":
+            text = self.collapse(self.inline_children(node))
+            return f"[{text.strip()}]({node.get('href', '')})" if text.strip() else ""
+        if name in BLOCK_TAGS:
+            # Block elements nested inside inline content are flattened.
+            return " " + " ".join(self.blocks(node)) + " "
+        return self.inline_children(node)
+
+    def inline_children(self, tag):
+        return "".join(self.inline(child) for child in tag.children)
+
+    def delimit(self, text, marker):
+        """Wrap text in marker, keeping surrounding whitespace outside of it."""
+        stripped = text.strip()
+        if not stripped:
+            return text
+        leading = " " if text[:1].isspace() else ""
+        trailing = " " if text[-1:].isspace() else ""
+        return f"{leading}{marker}{stripped}{marker}{trailing}"
+
+    def collapse(self, text):
+        return WHITESPACE_RE.sub(" ", text)
+
+    def wrap(self, text):
+        """Collapse whitespace and wrap at the line width, honouring hard breaks."""
+        segments = [self.collapse(segment).strip() for segment in self.collapse(text).split(HARD_BREAK)]
+        while segments and not segments[-1]:
+            segments.pop()
+        while segments and not segments[0]:
+            segments.pop(0)
+        lines = []
+        for index, segment in enumerate(segments):
+            wrapped = textwrap.wrap(segment, self.width, break_long_words=False, break_on_hyphens=False) or [""]
+            if index < len(segments) - 1:
+                wrapped[-1] += "\\"
+            lines.extend(wrapped)
+        return LINE_START_ESCAPE_RE.sub(escape_line_start, "\n".join(lines))
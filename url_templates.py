@@ -0,0 +1,129 @@
+"""URL templates learned during the crawl, and sampling by template (--sample-per-template).
+
+A page's template is its path with ids ({id}: numbers, hashes, UUIDs) and
+slugs ({slug}) replaced, followed by its sorted query keys without values:
+/node/123 -> /node/{id}, /search?page=4&q=x -> /search?page=&q=. Slugs are
+learned: once more than LEARN_AFTER different slug-like segments (with a
+dash, underscore, dot or digit) turn up under the same parent, that
+position becomes {slug}, so /blog/first-post and /blog/another-post share
+/blog/{slug} while /about-us and /contact stay their own templates on a
+site that has few of them.
+
+TemplateSampler admits at most per_template pages per template and ranks
+them by how many pages of their template were admitted before, so the
+first page of a template nobody has seen yet goes before the fifth page of
+a known one (the rank is the request priority, and the order in which the
+frontier hands out pages). Pages are admitted per path and query, for both
+sites at once, so a reference page and its test counterpart are always
+crawled together. The counts live in the crawl state, so they hold across
+--distributed workers and --resume. The coverage report lists every
+template with the distinct pages discovered and crawled.
+
+The spider's UrlTemplates also gives the hybrid fetch decisions
+(fetch_strategy.py) and the url_pattern of the metrics records their
+templates, so every report groups pages the same way.
+"""
+import json
+import os
+import re
+from urllib.parse import parse_qsl, urlparse
+
+from bloom import BloomFilter
+from metrics_sink import METRICS_DIR
+
+NUMERIC_SEGMENT_RE = re.compile(r"^[0-9]+$|^[0-9a-f]{8,}$|^[0-9a-f-]{36}$")
+SLUG_SEGMENT_RE = re.compile(r"[-_.~0-9]")
+
+# Different slug-like segments under one parent before the position becomes {slug}.
+LEARN_AFTER = 5
+
+# Refused pages remembered in memory; a false positive leaves a new page out (and uncounted).
+REFUSED_CAPACITY = 1_000_000
+REFUSED_ERROR_RATE = 0.0001
+
+
+class UrlTemplates:
+    """Templates of URLs, learning slug positions from the URLs seen so far."""
+
+    def __init__(self, learn_after=LEARN_AFTER):
+        self.learn_after = learn_after
+        # Parent template -> slug-like segments seen under it, until it becomes a {slug} position.
+        self.candidates = {}
+        self.slug_parents = set()
+
+    def template(self, url):
+        parsed = urlparse(url)
+        path = ""
+        for segment in (segment for segment in parsed.path.split("/") if segment):
+            if NUMERIC_SEGMENT_RE.match(segment.lower()):
+                token = "{id}"
+            elif SLUG_SEGMENT_RE.search(segment) and self._is_slug(path, segment):
+                token = "{slug}"
+            else:
+                token = segment
+            path += "/" + token
+        keys = sorted({key for key, _ in parse_qsl(parsed.query, keep_blank_values=True)})
+        return (path or "/") + ("?" + "&".join(f"{key}=" for key in keys) if keys else "")
+
+    def _is_slug(self, parent, segment):
+        if parent in self.slug_parents:
+            return True
+        seen = self.candidates.setdefault(parent, set())
+        seen.add(segment)
+        if len(seen) > self.learn_after:
+            self.slug_parents.add(parent)
+            del self.candidates[parent]
+            return True
+        return False
+
+
+class TemplateSampler:
+    """Admits at most per_template pages of every URL template, counted in the crawl state."""
+
+    def __init__(self, per_template, state, templates=None):
+        self.per_template = per_template
+        self.state = state
+        self.templates = templates or UrlTemplates()
+        # Decisions already taken, so the links repeated on every page don't go to the database again.
+        self.ranks = {}
+        self.refused = BloomFilter(REFUSED_CAPACITY, REFUSED_ERROR_RATE)
+
+    def admit(self, key):
+        """Rank of the page (path and query) within its template, or None if the template is full."""
+        if key in self.ranks:
+            return self.ranks[key]
+        if key in self.refused:
+            return None
+        rank = self.state.admit_sample(self.templates.template(key), key, self.per_template)
+        if rank is None:
+            self.refused.add(key)
+        else:
+            self.ranks[key] = rank
+        return rank
+
+
+def write_coverage_report(coverage, per_template, metrics_dir=METRICS_DIR):
+    """Write the (template, discovered, crawled) rows as JSON and Markdown; returns the path of the Markdown report."""
+    rows = sorted(
+        ({"template": template, "discovered": discovered, "crawled": crawled}
+         for template, discovered, crawled in coverage),
+        key=lambda row: (-row["discovered"], row["template"]),
+    )
+    os.makedirs(metrics_dir, exist_ok=True)
+    with open(os.path.join(metrics_dir, "url_templates.json"), "w", encoding="utf-8") as f:
+        json.dump(rows, f, indent=2)
+
+    discovered = sum(row["discovered"] for row in rows)
+    crawled = sum(row["crawled"] for row in rows)
+    lines = [
+        "# URL template coverage", "",
+        f"{len(rows)} templates; {crawled} of {discovered} discovered pages crawled "
+        f"(at most {per_template} per template).", "",
+        "| template | discovered | crawled |",
+        "|---|---|---|",
+    ]
+    lines += [f"| {row['template']} | {row['discovered']} | {row['crawled']} |" for row in rows]
+    markdown_path = os.path.join(metrics_dir, "url_templates.md")
+    with open(markdown_path, "w", encoding="utf-8") as f:
+        f.write("\n".join(lines) + "\n")
+    return markdown_path
@@ -0,0 +1,192 @@
+"""Drupal watchdog lookups that run off the event loop on a small connection pool."""
+import asyncio
+import logging
+import re
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urlparse
+
+import phpserialize
+import pymysql
+
+logger = logging.getLogger(__name__)
+
+PER_PAGE_QUERY = """
+    SELECT timestamp, type, message, variables, severity
+    FROM watchdog
+    WHERE location LIKE %s AND severity <= 4
+    ORDER BY timestamp DESC
+    LIMIT 5;
+"""
+
+# wid is the primary key, so both queries are index range scans.
+WATERMARK_QUERY = "SELECT COALESCE(MAX(wid), 0) AS wid FROM watchdog;"
+
+WINDOW_QUERY = """
+    SELECT wid, timestamp, type, message, variables, severity, location
+    FROM watchdog
+    WHERE wid > %s AND severity <= 4
+    ORDER BY wid;
+"""
+
+# Seconds between bulk refreshes; lookups are served from the rows loaded so far.
+REFRESH_INTERVAL = 1.0
+
+
+def ignore_php_objects(class_name, obj_dict):
+    """Ignore PHP objects when deserializing."""
+    return "[Ignored PHP Object]"
+
+
+def replace_placeholders(message, variables):
+    return re.sub(r'(@\w+|%\w+)', lambda match: str(variables.get(match.group(0), match.group(0))), message)
+
+
+def format_log(log):
+    """Render one watchdog row as '<timestamp> [<type>]: <message>'."""
+    message = log['message']
+    variables = log['variables']
+    if variables:
+        try:
+            decoded_vars = phpserialize.loads(variables, decode_strings=True, object_hook=ignore_php_objects)
+            message = replace_placeholders(message, decoded_vars)
+        except (ValueError, AttributeError) as e:
+            logger.debug(f"Could not decode watchdog variables: {e}")
+    return f"{log['timestamp']} [{log['type']}]: {message}"
+
+
+def join_logs(logs):
+    combined_logs = [format_log(log) for log in logs]
+    return " | ".join(combined_logs) if combined_logs else "No errors"
+
+
+def location_path(location):
+    """Return the path part of a watchdog location (which is usually a full URL)."""
+    return urlparse(location or "").path or "/"
+
+
+def log_refresh_error(task):
+    if not task.cancelled() and task.exception() is not None:
+        logger.error(f"Failed to fetch watchdog logs: {task.exception()}")
+
+
+class WatchdogClient:
+    """Watchdog lookups for one site.
+
+    Queries run on a dedicated thread pool where every thread keeps its own
+    connection, so the pool size is also the number of open connections.
+
+    In "per-page" mode every lookup runs the original LIKE query, which
+    matches the path anywhere in the location (so /node/1 also gets the rows
+    of /node/12). In "bulk" mode the client records the highest wid when the
+    crawl starts, then pulls every newer row in primary-key range queries,
+    at most one per REFRESH_INTERVAL, and serves lookups from the rows it
+    has, matched to pages by exact path. Lookups never wait for the
+    database: each one starts a background refresh if none is running, so
+    rows logged in the last REFRESH_INTERVAL (and query) before a lookup may
+    not be in its result yet.
+    """
+
+    def __init__(self, db_config, mode="per-page", pool_size=4):
+        self.db_config = db_config
+        self.mode = mode
+        self.executor = ThreadPoolExecutor(max_workers=pool_size, thread_name_prefix="watchdog")
+        self._local = threading.local()
+        self._connections = []
+        self._connections_lock = threading.Lock()
+
+        # Bulk mode state.
+        self._watermark_future = None
+        self._last_wid = 0
+        self._logs_by_path = {}
+        self._refresh_task = None
+        self._last_refresh_started = float("-inf")
+
+    def start(self):
+        """Record the crawl window start without blocking the caller."""
+        if self.mode == "bulk" and self._watermark_future is None:
+            self._watermark_future = self.executor.submit(self._fetch_watermark)
+
+    def close(self):
+        # Wait for running queries, so no connection is closed while a worker uses it.
+        self.executor.shutdown(wait=True, cancel_futures=True)
+        with self._connections_lock:
+            for connection in self._connections:
+                try:
+                    connection.close()
+                except pymysql.MySQLError:
+                    pass
+            self._connections.clear()
+
+    async def errors_for(self, url):
+        """Return the formatted watchdog errors for a crawled URL."""
+        path = urlparse(url).path or "/"
+        try:
+            if self.mode == "bulk":
+                self._schedule_refresh()
+                logs = self._logs_by_path.get(path, [])[-5:]
+                return join_logs(reversed(logs))
+            loop = asyncio.get_running_loop()
+            logs = await loop.run_in_executor(self.executor, self._query, PER_PAGE_QUERY, ("%" + path + "%",))
+            return join_logs(logs)
+        except pymysql.MySQLError as e:
+            logger.error(f"Failed to fetch watchdog logs: {e}")
+            return "Error fetching logs"
+
+    def _schedule_refresh(self):
+        """Start a background refresh unless one is running (or waiting for its turn)."""
+        if self._refresh_task is None or self._refresh_task.done():
+            self._refresh_task = asyncio.ensure_future(self._refresh())
+            self._refresh_task.add_done_callback(log_refresh_error)
+
+    async def _refresh(self):
+        delay = self._last_refresh_started + REFRESH_INTERVAL - time.monotonic()
+        if delay > 0:
+            await asyncio.sleep(delay)
+        self._last_refresh_started = time.monotonic()
+        if self._watermark_future is None:
+            self.start()
+        try:
+            watermark = await asyncio.wrap_future(self._watermark_future)
+        except pymysql.MySQLError:
+            # Retry the watermark on the next lookup rather than failing forever.
+            self._watermark_future = None
+            raise
+        self._last_wid = max(self._last_wid, watermark)
+        loop = asyncio.get_running_loop()
+        rows = await loop.run_in_executor(self.executor, self._query, WINDOW_QUERY, (self._last_wid,))
+        for row in rows:
+            logs = self._logs_by_path.setdefault(location_path(row["location"]), [])
+            logs.append(row)
+            del logs[:-5]
+            self._last_wid = max(self._last_wid, row["wid"])
+
+    def _fetch_watermark(self):
+        rows = self._query(WATERMARK_QUERY)
+        return int(rows[0]["wid"]) if rows else 0
+
+    def _connection(self):
+        connection = getattr(self._local, "connection", None)
+        if connection is None:
+            connection = pymysql.connect(
+                host=self.db_config["host"],
+                port=int(self.db_config["port"]),
+                user=self.db_config["user"],
+                password=self.db_config["password"],
+                database=self.db_config["database"],
+                charset="utf8mb4",
+                cursorclass=pymysql.cursors.DictCursor,
+                autocommit=True,
+            )
+            self._local.connection = connection
+            with self._connections_lock:
+                self._connections.append(connection)
+        else:
+            connection.ping(reconnect=True)
+        return connection
+
+    def _query(self, sql, params=None):
+        with self._connection().cursor() as cursor:
+            cursor.execute(sql, params)
+            return cursor.fetchall()